@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Hashable
+
+
+class TTLCache:
+    r"""进程内线程安全的LRU缓存
+
+    Parameters:
+        maxsize:最大缓存数量,超出后淘汰最久未使用的数据
+        ttl:缓存有效期(秒),为None时不过期
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        r"""获取缓存,不存在或已过期时返回default
+        """
+        with self._lock:
+            try:
+                expire_at, value = self._data[key]
+            except KeyError:
+                return default
+
+            if expire_at is not None and expire_at <= monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        r"""写入缓存
+        """
+        expire_at = None if self.ttl is None else monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expire_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        r"""删除缓存
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        r"""清空缓存
+        """
+        with self._lock:
+            self._data.clear()
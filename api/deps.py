@@ -1,16 +1,41 @@
-from typing import Generator, Any
+import json
+import zlib
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from datetime import datetime
+from enum import Enum
+from typing import AsyncGenerator, Callable, Any, Generic, TypeVar
 from dataclasses import dataclass
+import orjson
 from fastapi import Query, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session
 from api.config import settings
+from api.pool import TimedQueuePool, TimedAsyncQueuePool
+from api.instrument import instrument_engine
+from api.metrics import JWT_FAILURE_TOTAL, jwt_failure_reason
 from api.security import jwt_api
 from api.errcode import APIErr
+from api.schema.permission import PermissionAPI
 
-engine = create_engine(**settings.db_settings)
+engine = create_engine(poolclass=TimedQueuePool, **settings.db_settings)
 localSession = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# 异步模式下请求使用asyncpg会话,同步查询逻辑通过run_sync在greenlet中执行
+async_engine = create_async_engine(
+    poolclass=TimedAsyncQueuePool, **settings.async_db_settings) if settings.db_async else None
+localAsyncSession = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False) if settings.db_async else None
+
+if settings.sql_instrument:
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+
 oauth2 = OAuth2PasswordBearer("/auth/docs_login")
 
 
@@ -25,6 +50,34 @@ class JwtPayload:
     # 是否为登录组织的Owner(跳过鉴权认证)
     is_org_owner: bool = False
     client_id: str = ""
+    # 权限注册表版本号,与当前注册表版本不一致时位图失效
+    scope_version: int = 0
+    # 权限位图(为空时表示token未携带授权范围)
+    scope_bitmap: str = ""
+
+
+class OptCountStrategy(str, Enum):
+    # 精确统计
+    EXACT: str = "exact"
+    # 按查询条件缓存统计结果
+    CACHED: str = "cached"
+    # 使用数据库执行计划估算
+    ESTIMATE: str = "estimate"
+    # 不统计总数
+    NONE: str = "none"
+
+
+class OptExportFormat(str, Enum):
+    # 每行一个JSON对象
+    NDJSON: str = "ndjson"
+    CSV: str = "csv"
+
+
+class OptPhoneListMode(str, Enum):
+    # 脱敏显示
+    MASK: str = "mask"
+    # 不返回手机号
+    OMIT: str = "omit"
 
 
 @dataclass
@@ -33,15 +86,54 @@ class Pagination:
     """
     page_idx: int = 1
     page_size: int = 10
+    # 游标(为None时使用页码分页,为空字符串时从第一页开始游标分页)
+    cursor: str | None = None
+    # 总数统计策略(为None时使用配置的默认策略)
+    count_strategy: OptCountStrategy | None = None
 
 
-@dataclass
-class Rsp:
-    """RESTFUL API请求返回结果
+T = TypeVar("T")
+
+
+class Rsp(BaseModel, Generic[T]):
+    """RESTFUL API请求返回结果,接口通过Rsp[数据类型]声明data的结构,未声明时为Any
     """
     code: int = APIErr.NO_ERROR["code"]
     message: str = APIErr.NO_ERROR["message"]
-    data: Any | None = None
+    data: T | None = None
+
+
+class OffsetPageInfo(BaseModel):
+    """页码分页信息
+    """
+    page_idx: int
+    page_size: int
+    page_total: int | None
+    total: int | None
+    count_strategy: OptCountStrategy
+
+
+class CursorPageInfo(BaseModel):
+    """游标分页信息,next_cursor为None时表示已无下一页
+    """
+    page_size: int
+    cursor: str | None
+    next_cursor: str | None
+
+
+class Page(BaseModel, Generic[T]):
+    """分页数据
+    """
+    records: list[T]
+    pagination: OffsetPageInfo | CursorPageInfo
+
+
+class FastJSONResponse(JSONResponse):
+    """使用orjson序列化的JSON返回
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
 
 
 @dataclass
@@ -53,26 +145,169 @@ class Permission:
     scope: str
 
 
+class ScopeRegistry:
+    r"""权限注册表,按注册顺序为每个权限标识分配位序号,用于生成和校验token中的权限位图
+    """
+
+    def __init__(self) -> None:
+        self.scopes: list[str] = []
+        self.version: int = 0
+        self._index: dict[str, int] = {}
+
+    def load(self, scopes: list[str]) -> None:
+        r"""加载权限标识,版本号由权限标识及其顺序计算得出
+        """
+        self.scopes = list(scopes)
+        self._index = {scope: idx for idx, scope in enumerate(self.scopes)}
+        self.version = zlib.crc32("\n".join(self.scopes).encode())
+
+    def mask(self, scopes: list[str]) -> int:
+        r"""权限标识转为位掩码,未注册的标识忽略
+        """
+        bits = 0
+        for scope in scopes:
+            if (idx := self._index.get(scope)) is not None:
+                bits |= 1 << idx
+        return bits
+
+    def encode(self, scopes: list[str]) -> str:
+        r"""权限标识编码为位图字符串(base64url)
+        """
+        bits = self.mask(scopes)
+        raw = bits.to_bytes(max((bits.bit_length() + 7) // 8, 1), "little")
+        return urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, bitmap: str) -> int:
+        r"""位图字符串解码为位掩码
+        """
+        raw = urlsafe_b64decode(bitmap + "=" * (-len(bitmap) % 4))
+        return int.from_bytes(raw, "little")
+
+
+# 由api.service在注册路由时加载
+scope_registry = ScopeRegistry()
+
+
+class LazySession:
+    r"""延迟获取的数据库会话
+
+    创建时不占用连接,首次执行数据库操作时才创建会话并从连接池获取连接,
+    通过run执行的数据库操作完成后立即关闭会话归还连接,连接池占用只与实际的数据库操作相关
+
+    Parameters:
+        factory:会话工厂(sessionmaker或async_sessionmaker)
+    """
+
+    def __init__(self, factory: sessionmaker | async_sessionmaker) -> None:
+        self._factory = factory
+        self._session: Session | AsyncSession | None = None
+
+    @property
+    def session(self) -> Session | AsyncSession:
+        r"""获取实际的数据库会话,首次访问时创建
+        """
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    @property
+    def is_active(self) -> bool:
+        r"""是否已创建实际的数据库会话
+        """
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.session, name)
+
+    async def run(self, fn: Callable, *args, **kw) -> Any:
+        r"""执行同步的数据库操作函数fn(session, *args, **kw),执行完成后关闭会话归还连接
+        """
+        session = self.session
+        if isinstance(session, AsyncSession):
+            try:
+                return await session.run_sync(fn, *args, **kw)
+            finally:
+                await session.close()
+
+        def call() -> Any:
+            try:
+                return fn(session, *args, **kw)
+            finally:
+                session.close()
+        return await run_in_threadpool(call)
+
+    async def close(self) -> None:
+        r"""关闭数据库会话,未使用过时不做任何操作
+        """
+        if self._session is None:
+            return
+        session, self._session = self._session, None
+        if isinstance(session, AsyncSession):
+            await session.close()
+        else:
+            await run_in_threadpool(session.close)
+
+
 @dataclass
 class Actor:
-    session: Session
+    session: LazySession | Session | AsyncSession
     user_uuid: str
     org_uuid: str
 
 
-def get_db_session() -> Generator:
-    """获取数据库会话Session
+async def get_db_session() -> AsyncGenerator:
+    """获取数据库会话,按配置使用同步或异步(asyncpg)会话,实际连接在首次使用时获取
     """
-    with localSession() as session:
+    session = LazySession(localAsyncSession if settings.db_async else localSession)
+    try:
         yield session
+    finally:
+        await session.close()
+
+
+async def run_query(session: LazySession | Session | AsyncSession, fn: Callable, *args, **kw) -> Any:
+    r"""执行同步的数据库操作函数fn(session, *args, **kw)
+
+    延迟会话执行完成后立即归还连接;
+    异步会话通过run_sync在greenlet中执行,等待数据库时不占用线程;
+    同步会话在线程池中执行,不阻塞事件循环
+    """
+    if isinstance(session, LazySession):
+        return await session.run(fn, *args, **kw)
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(fn, *args, **kw)
+    return await run_in_threadpool(fn, session, *args, **kw)
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    r"""生成分页游标,游标内容为最后一条数据的(created_at, id)
+    """
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":"))
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    r"""解析分页游标,返回(created_at, id)
+    """
+    raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    created_at, id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(id)
 
 
 def get_page_info(page_idx: int = Query(default=1, description="页数", ge=0),
-                  page_size: int = Query(default=10, description="每页数量", ge=0)) -> Pagination:
-    return Pagination(page_idx=page_idx, page_size=page_size)
+                  page_size: int = Query(default=10, description="每页数量", ge=0),
+                  cursor: str = Query(default=None, description="分页游标,传空字符串开启游标分页,翻页时传入上一页返回的next_cursor"),
+                  count_strategy: OptCountStrategy = Query(default=None, description="总数统计策略")) -> Pagination:
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except Exception:
+            raise HTTPException(400, detail="无效的分页游标")
+    return Pagination(page_idx=page_idx, page_size=page_size,
+                      cursor=cursor, count_strategy=count_strategy)
 
 
-def get_actor_info(security_scope: SecurityScopes,
+async def get_actor_info(security_scope: SecurityScopes,
                    token=Depends(oauth2),
                    session=Depends(get_db_session)) -> Actor:
     try:
@@ -82,24 +317,31 @@ def get_actor_info(security_scope: SecurityScopes,
             user_uuid=payload["user_uuid"],
             org_uuid=payload["org_uuid"]
         )
+        is_org_owner = payload["is_org_owner"]
+        scope_bitmap = payload.get("scope_bitmap", "")
+        scope_version = payload.get("scope_version", 0)
+    except Exception as e:
+        JWT_FAILURE_TOTAL.labels(jwt_failure_reason(e)).inc()
+        raise HTTPException(401, detail=f"{e}")
 
-        # 如果是组织Owner,则无需鉴权
-        if payload["is_org_owner"]:
-            return actor
-
-        # 获取用户的可用授权范围
-        allow_scopes = []
+    # 如果是组织Owner或调用接口无需权限,则无需鉴权
+    if is_org_owner or not security_scope.scopes:
+        return actor
 
-        # 如果调用接口有权限,则需要鉴权.
-        if security_scope.scopes:
-            for scopes in security_scope.scopes:
-                if scopes in allow_scopes:
-                    return actor
-            raise HTTPException(403, detail=f"无权限")
+    # token携带了当前版本的权限位图,直接按位校验
+    if scope_bitmap and scope_version == scope_registry.version:
+        if scope_registry.decode(scope_bitmap) & scope_registry.mask(security_scope.scopes):
+            return actor
+        raise HTTPException(403, detail=f"无权限")
 
-    except HTTPException as http_err:
-        raise http_err
-    except Exception as e:
-        raise HTTPException(401, detail=f"{e}")
+    # 获取用户的可用授权范围(优先使用进程内缓存)
+    allow_scopes = PermissionAPI.get_cached_scopes(
+        actor.org_uuid, actor.user_uuid)
+    if allow_scopes is None:
+        allow_scopes = await run_query(session, PermissionAPI.get_actor_scopes,
+                                       actor.org_uuid, actor.user_uuid)
 
-    return actor
+    for scope in security_scope.scopes:
+        if scope in allow_scopes:
+            return actor
+    raise HTTPException(403, detail=f"无权限")
@@ -11,3 +11,7 @@ class APIErr:
     ORG_UUID_EXISTED = dict(code=9, message="组织UUID已存在,请重试")
     ORG_NAME_EXISTED = dict(code=10, message="组织名称已存在")
     ORG_OWNER_NOT_EXISTED = dict(code=11, message="不存在该用户")
+    ACCOUNT_INVALID = dict(code=12, message="账号数据不正确")
+    IMPORT_FORMAT_ERROR = dict(code=13, message="不支持的导入文件格式")
+    IMPORT_BATCH_FAILED = dict(code=14, message="该批次导入失败,账号未创建")
+    IMPORT_READ_ERROR = dict(code=15, message="文件读取失败,该行及之后的数据未导入")
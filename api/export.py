@@ -0,0 +1,72 @@
+import csv
+from io import StringIO
+from typing import Callable
+import orjson
+from sqlalchemy import Select
+from starlette.responses import StreamingResponse
+from api.config import settings
+from api.deps import OptExportFormat, localSession, localAsyncSession
+from api.schema.base import iter_records, aiter_records
+
+
+def ndjson_encoder(columns: list[str]) -> Callable[[list[dict]], bytes]:
+    def encode(records: list[dict]) -> bytes:
+        return b"".join(orjson.dumps(record) + b"\n" for record in records)
+    return encode
+
+
+def csv_encoder(columns: list[str]) -> Callable[[list[dict]], bytes]:
+    # 首个批次前输出BOM及表头,便于Excel识别UTF-8编码
+    header = True
+
+    def encode(records: list[dict]) -> bytes:
+        nonlocal header
+        buffer = StringIO()
+        if header:
+            buffer.write("\ufeff")
+            csv.writer(buffer).writerow(columns)
+            header = False
+        writer = csv.DictWriter(buffer, columns, extrasaction="ignore")
+        writer.writerows(records)
+        return buffer.getvalue().encode("utf-8")
+    return encode
+
+
+EXPORT_FORMATS = {
+    OptExportFormat.NDJSON: (ndjson_encoder, "application/x-ndjson"),
+    OptExportFormat.CSV: (csv_encoder, "text/csv; charset=utf-8"),
+}
+
+
+def export_response(stmt: Select, export_format: OptExportFormat, filename: str, format_rules: list = []) -> StreamingResponse:
+    r"""流式导出查询结果,使用独立的数据库会话(请求的会话在返回响应前已关闭)及服务端游标分批读取
+
+    Parameters:
+        stmt:查询语句
+        export_format:导出格式
+        filename:导出文件名(不含扩展名)
+        format_rules:字段格式化规则(逐行或整批)
+    """
+    make_encoder, media_type = EXPORT_FORMATS[export_format]
+    columns = [column.key for column in stmt.selected_columns]
+    batch_size = settings.export_batch_size
+
+    if settings.db_async:
+        async def content():
+            encode = make_encoder(columns)
+            async with localAsyncSession() as session:
+                async for records in aiter_records(session, stmt, format_rules, batch_size):
+                    yield encode(records)
+                # 无数据时CSV也需要输出表头
+                yield encode([])
+    else:
+        # 同步生成器由StreamingResponse在线程池中迭代
+        def content():
+            encode = make_encoder(columns)
+            with localSession() as session:
+                for records in iter_records(session, stmt, format_rules, batch_size):
+                    yield encode(records)
+                yield encode([])
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"'}
+    return StreamingResponse(content(), media_type=media_type, headers=headers)
@@ -0,0 +1,136 @@
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from api.config import settings
+
+request_logger = logging.getLogger("api.request")
+sql_logger = logging.getLogger("api.sql")
+
+
+@dataclass
+class RequestStats:
+    r"""单个请求的SQL执行统计
+    """
+    method: str = ""
+    path: str = ""
+    status: int = 0
+    start: float = field(default_factory=perf_counter)
+    statements: int = 0
+    # 数据库执行耗时(秒)
+    db_time: float = 0.0
+    # 按语句(含占位符,不含参数值)统计执行次数
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.statements += 1
+        self.db_time += elapsed
+        self.shapes[statement] += 1
+
+    def n_plus_one(self) -> list[tuple[str, int]]:
+        r"""同一语句重复执行次数达到阈值的语句
+        """
+        threshold = settings.n_plus_one_threshold
+        if not threshold:
+            return []
+        return [(statement, count) for statement, count in self.shapes.most_common() if count >= threshold]
+
+    def server_timing(self) -> str:
+        return (f'db;desc="{self.statements} queries";dur={self.db_time * 1000:.3f}, '
+                f"total;dur={(perf_counter() - self.start) * 1000:.3f}")
+
+    def fields(self) -> dict:
+        return dict(method=self.method,
+                    path=self.path,
+                    status=self.status,
+                    duration_ms=round((perf_counter() - self.start) * 1000, 3),
+                    db_count=self.statements,
+                    db_ms=round(self.db_time * 1000, 3))
+
+
+# 当前请求的SQL统计(同步查询在线程池中执行时沿用请求的上下文)
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def one_line(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+def param_shape(parameters, executemany: bool = False) -> str:
+    r"""绑定参数的结构(参数名及类型),不输出参数值
+    """
+    if executemany:
+        rows = list(parameters or [])
+        return f"{len(rows)}x{param_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}:{type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._instrument_start = perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - context._instrument_start
+
+    stats = request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+    if settings.slow_query_ms and elapsed * 1000 >= settings.slow_query_ms:
+        fields = dict(path=stats.path if stats else "",
+                      elapsed_ms=round(elapsed * 1000, 3),
+                      statement=one_line(statement),
+                      params=param_shape(parameters, executemany))
+        sql_logger.warning("slow query: %s", " ".join(f"{k}={v}" for k, v in fields.items()), extra=fields)
+
+
+def instrument_engine(engine: Engine) -> None:
+    r"""为数据库引擎注册SQL统计事件(异步引擎传入engine.sync_engine)
+    """
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+class SQLInstrumentMiddleware:
+    r"""统计每个请求的SQL执行次数及耗时,通过Server-Timing头返回并输出日志,检测N+1查询
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(method=scope["method"], path=scope["path"])
+        token = request_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                stats.status = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            self.log(stats)
+
+    @staticmethod
+    def log(stats: RequestStats) -> None:
+        fields = stats.fields()
+        request_logger.info(" ".join(f"{k}={v}" for k, v in fields.items()), extra=fields)
+
+        for statement, count in stats.n_plus_one():
+            fields = dict(path=stats.path, count=count, statement=one_line(statement))
+            sql_logger.warning("n+1 query: %s", " ".join(f"{k}={v}" for k, v in fields.items()), extra=fields)
@@ -1,8 +1,30 @@
+from contextlib import asynccontextmanager
+from anyio.to_thread import current_default_thread_limiter
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from api.config import settings
+from api.deps import FastJSONResponse, engine, async_engine
+from api.instrument import SQLInstrumentMiddleware
+from api.metrics import MetricsMiddleware, metrics_endpoint, register_pools
+from api.security import hash_pool
 from api.service import routers
 
-app = FastAPI(**settings.fastapi_settings)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 请求线程池大小与连接池上限保持一致
+    current_default_thread_limiter().total_tokens = settings.threadpool_tokens
+    yield
+    hash_pool.shutdown()
+
+
+app = FastAPI(**settings.fastapi_settings, lifespan=lifespan,
+              **(dict(default_response_class=FastJSONResponse) if settings.orjson_response else {}))
 app.add_middleware(CORSMiddleware, **settings.cors)
+if settings.sql_instrument:
+    app.add_middleware(SQLInstrumentMiddleware)
+if settings.metrics_enabled:
+    register_pools({"sync": engine, "async": async_engine})
+    app.add_middleware(MetricsMiddleware)
+    app.add_route(settings.metrics_path, metrics_endpoint, include_in_schema=False)
 app.include_router(routers)
@@ -0,0 +1,123 @@
+from time import perf_counter
+from jose import ExpiredSignatureError, JWTError
+from jose.exceptions import JWTClaimsError
+from prometheus_client import CollectorRegistry, Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+from sqlalchemy import Engine
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from api.pool import pool_status
+
+# 独立的指标注册表,不包含prometheus_client默认的进程及GC指标
+registry = CollectorRegistry()
+
+REQUEST_DURATION = Histogram(
+    "uc_http_request_duration_seconds", "HTTP请求耗时",
+    ["method", "route"], registry=registry)
+
+REQUEST_TOTAL = Counter(
+    "uc_http_requests", "HTTP请求数",
+    ["method", "route", "status"], registry=registry)
+
+HASH_VERIFY_DURATION = Histogram(
+    "uc_hash_verify_duration_seconds", "密码哈希校验耗时(含哈希执行器排队)",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2, 5), registry=registry)
+
+JWT_FAILURE_TOTAL = Counter(
+    "uc_jwt_decode_failures", "JWT解析失败次数",
+    ["reason"], registry=registry)
+
+LOGIN_TOTAL = Counter(
+    "uc_login", "登录结果(按APIErr返回码)",
+    ["code"], registry=registry)
+
+
+def jwt_failure_reason(e: Exception) -> str:
+    r"""JWT解析失败原因
+    """
+    match e:
+        case ExpiredSignatureError():
+            return "expired"
+        case JWTClaimsError():
+            return "claims"
+        case JWTError():
+            return "invalid"
+        case KeyError():
+            return "payload"
+    return "other"
+
+
+class PoolCollector:
+    r"""采集时读取数据库连接池状态
+
+    Parameters:
+        engines:{连接池名称:数据库引擎}
+    """
+
+    def __init__(self, engines: dict[str, Engine]) -> None:
+        self.engines = engines
+
+    def collect(self):
+        gauges = {name: GaugeMetricFamily(f"uc_db_pool_{name}", desc, labels=["pool"]) for name, desc in (
+            ("size", "连接池大小"),
+            ("checkedin", "空闲连接数"),
+            ("checkedout", "已借出连接数"),
+            ("overflow", "溢出连接数"),
+        )}
+        checkouts = CounterMetricFamily("uc_db_pool_checkouts", "获取连接次数", labels=["pool"])
+        timeouts = CounterMetricFamily("uc_db_pool_timeouts", "获取连接超时次数", labels=["pool"])
+        wait = CounterMetricFamily("uc_db_pool_wait_seconds", "获取连接等待总时长", labels=["pool"])
+
+        for pool, engine in self.engines.items():
+            if (status := pool_status(engine)) is None:
+                continue
+            for name, gauge in gauges.items():
+                if name in status:
+                    gauge.add_metric([pool], status[name])
+            if "checkouts" in status:
+                checkouts.add_metric([pool], status["checkouts"])
+                timeouts.add_metric([pool], status["timeouts"])
+                wait.add_metric([pool], status["wait_total_ms"] / 1000)
+
+        yield from gauges.values()
+        yield from (checkouts, timeouts, wait)
+
+
+def register_pools(engines: dict[str, Engine | None]) -> None:
+    r"""注册连接池指标,未启用的连接池(None)跳过
+    """
+    registry.register(PoolCollector({name: engine for name, engine in engines.items() if engine is not None}))
+
+
+class MetricsMiddleware:
+    r"""按路由统计请求耗时及返回状态码,路由使用路径模板(如/account/detail),未匹配路由的请求统一记为unmatched
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_DURATION.labels(scope["method"], route).observe(perf_counter() - start)
+            REQUEST_TOTAL.labels(scope["method"], route, str(status)).inc()
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -1,11 +1,16 @@
 from sqlalchemy import String, Boolean, UniqueConstraint
-from api.model.base import ModelBase, ModelPrimaryKeyID,  M, mc
+from api.model.base import ModelBase, ModelPrimaryKeyID,  M, mc, trgm_index, live_index
 from api.model.org import Org
 
 
 class App(ModelPrimaryKeyID,  ModelBase):
     __tablename__ = "t_app"
     __table_args__ = (
+        trgm_index("idx_app_name_trgm", "app_name"),
+        # 应用详情,应用服务及角色关联
+        live_index("idx_app_uuid", "app_uuid"),
+        # 应用列表游标分页
+        live_index("idx_app_created", "created_at", "id"),
         dict(comment="应用信息")
     )
 
@@ -1,11 +1,12 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, DateTime, Boolean, func
+from sqlalchemy import BigInteger, Integer, DateTime, Boolean, DDL, Index, ColumnElement, event, func, column, and_
 from sqlalchemy.orm import DeclarativeBase, Mapped as M, mapped_column as mc
 
 
 class ModelPrimaryKeyID:
+    # SQLite只有INTEGER PRIMARY KEY才会自增
     id: M[int] = mc(
-        BigInteger,
+        BigInteger().with_variant(Integer, "sqlite"),
         primary_key=True,
         comment="ID"
     )
@@ -30,3 +31,34 @@ class ModelBase(DeclarativeBase):
         default=False,
         comment="数据逻辑删除标识"
     )
+
+
+# 模糊搜索的GIN索引(gin_trgm_ops)依赖pg_trgm扩展,建表前先创建
+event.listen(
+    ModelBase.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+# 部分索引条件,逻辑删除的数据不进入索引(查询条件需包含is_deleted == False才会使用),
+# 使用表达式而非文本,使索引条件与查询条件按同一方言生成(PostgreSQL:false,SQLite:0)
+NOT_DELETED = column("is_deleted") == False
+
+
+def live_index(name: str, *columns: str, unique: bool = False, where: ColumnElement = None) -> Index:
+    r"""只包含未删除数据的部分索引,where为附加的过滤条件
+    """
+    predicate = NOT_DELETED if where is None else and_(NOT_DELETED, where)
+    return Index(name, *columns,
+                 unique=unique,
+                 postgresql_where=predicate,
+                 sqlite_where=predicate)
+
+
+def trgm_index(name: str, column: str) -> Index:
+    r"""创建支持ILIKE模糊匹配的pg_trgm GIN索引
+    """
+    return Index(name, column,
+                 postgresql_using="gin",
+                 postgresql_ops={column: "gin_trgm_ops"})
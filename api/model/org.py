@@ -1,6 +1,6 @@
 from enum import Enum
 from sqlalchemy import String, Integer, UniqueConstraint, Boolean
-from api.model.base import ModelBase, ModelPrimaryKeyID, M, mc
+from api.model.base import ModelBase, ModelPrimaryKeyID, M, mc, trgm_index, live_index
 from api.model.user import User
 
 
@@ -17,6 +17,13 @@ class OptOrgUserStatus(int, Enum):
 class Org(ModelPrimaryKeyID,  ModelBase):
     __tablename__ = "t_org"
     __table_args__ = (
+        trgm_index("idx_org_name_trgm", "org_name"),
+        # 组织列表(按创建时间倒序)
+        live_index("idx_org_created", "created_at", "id"),
+        # 超级管理员判断,组织Owner关联
+        live_index("idx_org_owner", "org_owner_uuid"),
+        # 组织名称唯一,插入时由唯一约束判断组织名称是否重复
+        live_index("uni_org_name", "org_name", unique=True),
         dict(comment="组织信息")
     )
 
@@ -51,11 +58,40 @@ class Org(ModelPrimaryKeyID,  ModelBase):
         comment="是否为管理者组织"
     )
 
+    # 以下计数由写入操作在同一事务内增量维护,见api.schema.member
+    member_total: M[int] = mc(
+        Integer,
+        default=0,
+        comment="组织成员数"
+    )
+
+    member_enable: M[int] = mc(
+        Integer,
+        default=0,
+        comment="启用的组织成员数"
+    )
+
+    member_disable: M[int] = mc(
+        Integer,
+        default=0,
+        comment="禁用的组织成员数"
+    )
+
+    role_total: M[int] = mc(
+        Integer,
+        default=0,
+        comment="组织专属角色数"
+    )
+
 
 class OrgUser(ModelPrimaryKeyID, ModelBase):
     __tablename__ = "t_org_user"
     __table_args__ = (
         UniqueConstraint("org_id", "user_id", name="uni_org_user"),
+        # 登录及用户所属组织查询(uni_org_user的首列为org_id,无法按user_id查询)
+        live_index("idx_org_user_user", "user_id"),
+        # 组织用户列表(按创建时间倒序)
+        live_index("idx_org_user_org_created", "org_id", "created_at", "id"),
         dict(comment="组织用户信息")
     )
 
@@ -86,3 +122,83 @@ class OrgUser(ModelPrimaryKeyID, ModelBase):
         default=OptOrgUserStatus.ENABLE.value,
         comment="组织用户状态"
     )
+
+
+class OrgMember(ModelPrimaryKeyID, ModelBase):
+    r"""组织成员读模型:有效的组织用户(组织,用户及组织用户均未删除)及其组织和账号信息,
+    id与组织用户ID一致,创建和更新时间取自组织用户,由写入操作在同一事务内增量刷新
+    """
+    __tablename__ = "t_org_member"
+    __table_args__ = (
+        UniqueConstraint("org_uuid", "user_uuid", name="uni_org_member"),
+        # 组织用户列表(按加入时间倒序)
+        live_index("idx_org_member_org_created", "org_uuid", "created_at", "id"),
+        # 按用户增量刷新
+        live_index("idx_org_member_user", "user_id"),
+        dict(comment="组织成员读模型")
+    )
+
+    org_id: M[int] = mc(
+        Org.id.type,
+        comment="组织ID"
+    )
+
+    org_uuid: M[str] = mc(
+        Org.org_uuid.type,
+        comment="组织UUID"
+    )
+
+    org_name: M[str] = mc(
+        Org.org_name.type,
+        comment="组织名称"
+    )
+
+    org_status: M[int] = mc(
+        Integer,
+        comment="组织状态"
+    )
+
+    user_id: M[int] = mc(
+        User.id.type,
+        comment="用户ID"
+    )
+
+    user_uuid: M[str] = mc(
+        User.user_uuid.type,
+        comment="用户UUID"
+    )
+
+    account: M[str] = mc(
+        User.account.type,
+        comment="用户账号"
+    )
+
+    nickname: M[str] = mc(
+        User.nickname.type,
+        comment="用户昵称"
+    )
+
+    phone_enc: M[str] = mc(
+        User.phone_enc.type,
+        comment="手机号(加密)"
+    )
+
+    account_status: M[int] = mc(
+        Integer,
+        comment="用户账号状态"
+    )
+
+    org_user_nickname: M[str] = mc(
+        OrgUser.org_user_nickname.type,
+        comment="组织用户昵称"
+    )
+
+    org_avatar_url: M[str] = mc(
+        OrgUser.org_avatar_url.type,
+        comment="组织用户头像URL"
+    )
+
+    org_user_status: M[int] = mc(
+        Integer,
+        comment="组织用户状态"
+    )
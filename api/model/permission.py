@@ -1,7 +1,7 @@
 from enum import Enum
 from sqlalchemy import Integer, UniqueConstraint
 from api.model.app import App, AppService
-from api.model.base import ModelBase, ModelPrimaryKeyID,  M, mc
+from api.model.base import ModelBase, ModelPrimaryKeyID,  M, mc, live_index
 from api.model.org import Org
 from api.model.role import Role
 
@@ -24,6 +24,8 @@ class AppRole(ModelPrimaryKeyID, ModelBase):
     __tablename__ = "t_app_role"
     __table_args__ = (
         UniqueConstraint("app_id", "role_id", name="uni_app_role"),
+        # 授权范围查询(角色->应用)
+        live_index("idx_app_role_role", "role_id"),
         dict(comment="应用角色表")
     )
 
@@ -1,6 +1,6 @@
 from enum import Enum
 from sqlalchemy import String, Integer, UniqueConstraint
-from api.model.base import ModelBase, ModelPrimaryKeyID,  M, mc
+from api.model.base import ModelBase, ModelPrimaryKeyID,  M, mc, live_index
 from api.model.app import App
 from api.model.org import Org
 from api.model.user import User
@@ -16,6 +16,8 @@ class Role(ModelPrimaryKeyID,  ModelBase):
     __table_args__ = (
         UniqueConstraint("role_name", "role_org_uuid",
                          "app_uuid", name="uni_role"),
+        # 应用角色列表
+        live_index("idx_role_app", "app_uuid", "role_org_uuid"),
         dict(comment="角色信息")
     )
 
@@ -54,6 +56,8 @@ class OrgUserRole(ModelPrimaryKeyID, ModelBase):
     __table_args__ = (
         UniqueConstraint("org_uuid", "user_uuid", "role_id",
                          name="uni_org_user_role"),
+        # 按用户处理角色(如删除账号)
+        live_index("idx_org_user_role_user", "user_uuid"),
         dict(comment="组织用户角色信息")
     )
 
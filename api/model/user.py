@@ -1,6 +1,6 @@
 from enum import Enum
-from sqlalchemy import String, Integer, UniqueConstraint
-from api.model.base import ModelBase, ModelPrimaryKeyID, M, mc
+from sqlalchemy import String, Integer, UniqueConstraint, Index, column
+from api.model.base import ModelBase, ModelPrimaryKeyID, M, mc, trgm_index, live_index
 
 
 class OptAccountStatus(int, Enum):
@@ -16,6 +16,13 @@ class OptUserAuthType(int, Enum):
 class User(ModelPrimaryKeyID, ModelBase):
     __tablename__ = "t_user"
     __table_args__ = (
+        trgm_index("idx_user_account_trgm", "account"),
+        trgm_index("idx_user_nickname_trgm", "nickname"),
+        Index("idx_user_phone_bidx", "phone_bidx"),
+        # 手机号唯一(未填写手机号的账号除外),插入时由唯一约束判断手机号是否重复
+        live_index("uni_user_phone_bidx", "phone_bidx", unique=True, where=column("phone_bidx") != ""),
+        # 账号列表(按创建时间倒序)
+        live_index("idx_user_created", "created_at", "id"),
         dict(comment="用户信息")
     )
 
@@ -44,6 +51,12 @@ class User(ModelPrimaryKeyID, ModelBase):
         comment="用户手机号(加密)"
     )
 
+    phone_bidx: M[str] = mc(
+        String(64),
+        default="",
+        comment="用户手机号盲索引(HMAC-SHA256),用于手机号查询和唯一性判断"
+    )
+
     avatar_url: M[str] = mc(
         String(2048),
         default="",
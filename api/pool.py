@@ -0,0 +1,106 @@
+from threading import Lock
+from time import perf_counter
+from anyio.to_thread import current_default_thread_limiter
+from sqlalchemy import Engine, exc
+from sqlalchemy.pool import Pool, QueuePool, AsyncAdaptedQueuePool
+
+
+class PoolStats:
+    r"""连接池获取连接的等待统计
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, timeout: bool = False) -> None:
+        r"""记录一次获取连接的等待时长(秒)
+        """
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timeout
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def snapshot(self) -> dict:
+        r"""获取统计信息,时长单位为毫秒
+        """
+        with self._lock:
+            return dict(checkouts=self.checkouts,
+                        timeouts=self.timeouts,
+                        wait_total_ms=round(self.wait_total * 1000, 3),
+                        wait_avg_ms=round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0,
+                        wait_max_ms=round(self.wait_max * 1000, 3))
+
+
+class TimedPoolMixin:
+    r"""记录获取连接等待时长的连接池
+    """
+
+    def __init__(self, *args, **kw) -> None:
+        super().__init__(*args, **kw)
+        self.stats = PoolStats()
+
+    def connect(self):
+        start = perf_counter()
+        timeout = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timeout = True
+            raise
+        finally:
+            self.stats.record(perf_counter() - start, timeout)
+
+    def recreate(self) -> Pool:
+        # 连接池重建(dispose)后沿用原有统计
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(engine: Engine | None) -> dict | None:
+    r"""获取连接池状态
+
+    Returns:
+        None:未启用该连接池
+        Dict{
+            size:连接池大小
+            checkedin:空闲连接数
+            checkedout:已借出连接数
+            overflow:溢出连接数(为负数时表示连接池尚未建满)
+            checkouts/timeouts/wait_*:获取连接的等待统计
+        }
+    """
+    if engine is None:
+        return None
+
+    pool = engine.pool
+    data = dict(size=pool.size(),
+                checkedin=pool.checkedin(),
+                checkedout=pool.checkedout(),
+                overflow=pool.overflow()) if isinstance(pool, QueuePool) else dict(status=pool.status())
+
+    if isinstance(pool, TimedPoolMixin):
+        data.update(pool.stats.snapshot())
+    return data
+
+
+def threadpool_status() -> dict:
+    r"""获取请求线程池(AnyIO默认线程池)状态,需在事件循环中调用
+    """
+    statistics = current_default_thread_limiter().statistics()
+    return dict(total=statistics.total_tokens,
+                borrowed=statistics.borrowed_tokens,
+                waiting=statistics.tasks_waiting)
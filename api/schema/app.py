@@ -1,10 +1,10 @@
-from dataclasses import asdict
-from sqlalchemy import select, and_
+from sqlalchemy import select
 from jhu.orm import ORM, Session, ORMFormatRule
 from api.deps import Pagination
 from api.model.role import Role
 from api.model.app import App, AppService
 from api.model.permission import AppRole
+from api.schema.base import paginate, ilike_contains
 
 
 class AppAPI:
@@ -27,7 +27,7 @@ class AppAPI:
         ] if not select_fields else select_fields
 
         expressions = [expression for condition, expression in [
-            (app_name is not None, App.app_name.ilike(f"%{app_name}%")),
+            (app_name, ilike_contains(App.app_name, app_name)),
         ] if condition]
 
         stmt = select(
@@ -37,8 +37,9 @@ class AppAPI:
             *expressions
         )
 
-        return ORM.pagination(
-            session, stmt, **asdict(pagination), order=[App.updated_at.desc()])
+        return paginate(session, stmt, pagination,
+                        order=[App.updated_at.desc()],
+                        keyset=(App.created_at, App.id))
 
     @staticmethod
     def get_app_detail(
@@ -68,7 +69,7 @@ class AppAPI:
             AppService.service_name,
             AppService.is_enable
         ).join(
-            App, App.id == AppService.app_id
+            App, App.app_uuid == AppService.app_uuid
         ).where(
             App.is_deleted == False,
             AppService.is_deleted == False,
@@ -86,13 +87,14 @@ class AppAPI:
             AppService.service_identify,
             AppService.service_name
         ).join(
-            App, App.id == AppService.app_id
+            App, App.app_uuid == AppService.app_uuid
         ).where(
             App.is_deleted == False,
+            AppService.is_deleted == False,
             App.id == app_id
         )
 
-        return ORM.pagination(session, stmt, **asdict(pagination), order=[AppService.service_identify])
+        return paginate(session, stmt, pagination, order=[AppService.service_identify])
 
     @staticmethod
     def get_app_role_list(session: Session, app_id: int) -> list:
@@ -114,16 +116,23 @@ class AppAPI:
 
     @staticmethod
     def get_app_role_permission(session: Session, pagination: Pagination, app_id: int, role_id: int):
+        r"""获取应用角色的权限(应用角色拥有该应用下的所有服务)
+        """
         stmt = select(
-            AppRole.service_identify,
+            AppService.service_identify,
             AppService.service_name,
+        ).select_from(
+            AppRole
         ).join(
-            AppService, and_(AppService.app_id == AppRole.app_id,
-                             AppService.service_identify == AppRole.service_identify)
+            App, App.id == AppRole.app_id
+        ).join(
+            AppService, AppService.app_uuid == App.app_uuid
         ).where(
+            AppRole.is_deleted == False,
+            App.is_deleted == False,
             AppService.is_deleted == False,
             AppRole.app_id == app_id,
             AppRole.role_id == role_id
         )
 
-        return ORM.ALL(session, stmt, **asdict(pagination))
+        return paginate(session, stmt, pagination, order=[AppService.service_identify])
@@ -0,0 +1,302 @@
+import json
+from dataclasses import dataclass
+from math import ceil
+from typing import AsyncIterator, Callable, Iterator
+from sqlalchemy import Select, Update, ColumnElement, tuple_, inspect, update, values, column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, InstrumentedAttribute
+from jhu.orm import ORM, ORMFormatRule, format_filed
+from api.cache import TTLCache
+from api.config import settings
+from api.deps import Pagination, OptCountStrategy, encode_cursor, decode_cursor
+
+# 游标分页时附加查询的排序键字段名
+CURSOR_CREATED_AT = "_cursor_created_at"
+CURSOR_ID = "_cursor_id"
+
+# 分页总数缓存,key为编译后的SQL及其参数
+count_cache = TTLCache(settings.page_count_cache_size,
+                       settings.page_count_cache_ttl)
+
+
+@dataclass
+class BatchFormatRule:
+    r"""整页数据的字段格式化规则,format接收整页数据该字段的值列表,返回格式化后的值列表
+    """
+    filed: str
+    format: Callable[[list], list]
+
+
+def split_format_rules(format_rules: list) -> tuple[list[ORMFormatRule], list[BatchFormatRule]]:
+    r"""拆分逐行格式化规则和整页格式化规则
+    """
+    batch_rules = [rule for rule in format_rules if isinstance(rule, BatchFormatRule)]
+    return [rule for rule in format_rules if not isinstance(rule, BatchFormatRule)], batch_rules
+
+
+def apply_batch_rules(records: list[dict], batch_rules: list[BatchFormatRule]) -> list[dict]:
+    r"""按整页(批次)格式化数据
+    """
+    for rule in batch_rules:
+        if records and rule.filed in records[0]:
+            values = rule.format([record[rule.filed] for record in records])
+            for record, value in zip(records, values):
+                record[rule.filed] = value
+    return records
+
+
+def fetch_records(session: Session, stmt: Select, format_rules: list = []) -> list[dict]:
+    r"""查询数据列表,逐行格式化规则按行处理,整页格式化规则按整页数据批量处理
+    """
+    row_rules, batch_rules = split_format_rules(format_rules)
+    return apply_batch_rules(ORM.all(session, stmt, row_rules), batch_rules)
+
+
+def iter_records(session: Session, stmt: Select, format_rules: list = [], batch_size: int = 1000) -> Iterator[list[dict]]:
+    r"""流式查询数据(服务端游标),按批次返回格式化后的数据,内存占用与结果总量无关
+    """
+    row_rules, batch_rules = split_format_rules(format_rules)
+    result = session.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.mappings().partitions():
+        yield apply_batch_rules([format_filed(dict(row), row_rules) for row in rows], batch_rules)
+
+
+async def aiter_records(session: AsyncSession, stmt: Select, format_rules: list = [], batch_size: int = 1000) -> AsyncIterator[list[dict]]:
+    r"""流式查询数据的异步版本
+    """
+    row_rules, batch_rules = split_format_rules(format_rules)
+    result = await session.stream(stmt.execution_options(yield_per=batch_size))
+    async for rows in result.mappings().partitions():
+        yield apply_batch_rules([format_filed(dict(row), row_rules) for row in rows], batch_rules)
+
+
+def ilike_contains(column: InstrumentedAttribute, value: str | None) -> ColumnElement:
+    r"""模糊匹配(包含),转义用户输入中的通配符,可命中pg_trgm的GIN索引
+    """
+    value = (value or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{value}%", escape="\\")
+
+
+# 支持INSERT ... ON CONFLICT DO NOTHING的数据库
+ON_CONFLICT_INSERT = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def insert_ignore(session: Session, obj) -> int | None:
+    r"""插入模型对象,违反唯一约束时不插入,一次往返完成唯一性判断和插入(INSERT ... ON CONFLICT DO NOTHING RETURNING id)
+
+    Returns:
+        插入数据的ID(同时写入obj.id),违反唯一约束时返回None
+    """
+    model = type(obj)
+    values = {attr.key: value for attr in inspect(model).column_attrs
+              if (value := getattr(obj, attr.key)) is not None}
+
+    if (dialect_insert := ON_CONFLICT_INSERT.get(session.get_bind().dialect.name)) is None:
+        # 其他数据库使用保存点捕获唯一约束异常
+        try:
+            with session.begin_nested():
+                session.add(obj)
+        except IntegrityError:
+            return None
+        return obj.id
+
+    stmt = dialect_insert(model).values(**values).on_conflict_do_nothing().returning(model.id)
+    obj.id = session.scalar(stmt)
+    return obj.id
+
+
+def update_rows_stmt(model: type, key: str, rows: list[dict]) -> Update:
+    r"""按key字段批量修改多行数据(每行的值不同),生成一条UPDATE语句:
+    WITH v(...) AS (VALUES ...) UPDATE ... FROM v WHERE key = v.key
+
+    Parameters:
+        model:数据模型
+        key:定位数据的字段名
+        rows:[{key:值, 修改字段:修改值}],每行的字段需一致
+    """
+    fields = list(rows[0])
+    data = values(*[column(field, getattr(model, field).type) for field in fields], name="v").data(
+        [tuple(row[field] for field in fields) for row in rows]).cte("v")
+
+    return update(model).where(getattr(model, key) == data.c[key]).values(
+        {field: data.c[field] for field in fields if field != key}
+    ).execution_options(synchronize_session=False)
+
+
+def compile_stmt(session: Session, stmt: Select) -> tuple[str, dict | tuple]:
+    r"""按当前数据库方言编译语句,返回(SQL, 参数)
+    """
+    compiled = stmt.compile(dialect=session.get_bind().dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+
+def estimate_counts(session: Session, stmt: Select) -> int:
+    r"""通过数据库执行计划估算数据量,非PostgreSQL时精确统计
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return ORM.counts(session, stmt)
+
+    sql, params = compile_stmt(session, stmt)
+    plan = session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def cached_counts(session: Session, stmt: Select) -> int:
+    r"""统计数据量,相同查询条件在缓存有效期内复用统计结果
+    """
+    sql, params = compile_stmt(session, stmt)
+    key = (sql, repr(params))
+
+    if (total := count_cache.get(key)) is None:
+        total = ORM.counts(session, stmt)
+        count_cache.set(key, total)
+    return total
+
+
+def count_total(session: Session, stmt: Select, count_strategy: OptCountStrategy = None) -> int | None:
+    r"""按统计策略获取分页总数
+
+    Returns:
+        None:不统计总数
+        int:数据总数(estimate策略下为估算值)
+    """
+    match OptCountStrategy(count_strategy or settings.page_count_strategy):
+        case OptCountStrategy.NONE:
+            return None
+        case OptCountStrategy.ESTIMATE:
+            return estimate_counts(session, stmt)
+        case OptCountStrategy.CACHED:
+            return cached_counts(session, stmt)
+        case _:
+            return ORM.counts(session, stmt)
+
+
+def offset_pagination(
+    session: Session,
+    stmt: Select,
+    pagination: Pagination,
+    order: list = None,
+    format_rules: list[ORMFormatRule | BatchFormatRule] = []
+) -> dict:
+    r"""页码分页查询,总数按pagination.count_strategy统计
+
+    Returns:
+        Dict{
+            records:数据列表
+            pagination:{page_idx, page_size, page_total, total, count_strategy}, 不统计总数时total和page_total为None
+        }
+    """
+    page_idx, page_size = pagination.page_idx, max(pagination.page_size, 1)
+    if page_idx < 1:
+        page_idx = 1
+
+    count_strategy = OptCountStrategy(
+        pagination.count_strategy or settings.page_count_strategy)
+    total = count_total(session, stmt, count_strategy)
+    page_total = None if total is None else ceil(total / page_size)
+
+    data = dict(records=[],
+                pagination=dict(page_idx=page_idx,
+                                page_size=page_size,
+                                page_total=page_total,
+                                total=total,
+                                count_strategy=count_strategy.value))
+
+    # 精确统计的总数为零,不需要继续执行查询(缓存值和估算值可能不准,不作判断)
+    if total == 0 and count_strategy == OptCountStrategy.EXACT:
+        return data
+
+    if order is not None:
+        stmt = stmt.order_by(*order)
+
+    stmt = stmt.offset((page_idx - 1) * page_size).limit(page_size)
+    data["records"] = fetch_records(session, stmt, format_rules)
+
+    return data
+
+
+def keyset_pagination(
+    session: Session,
+    stmt: Select,
+    pagination: Pagination,
+    keyset: tuple[InstrumentedAttribute, InstrumentedAttribute],
+    format_rules: list[ORMFormatRule | BatchFormatRule] = []
+) -> dict:
+    r"""游标分页查询,按(created_at, id)倒序,翻页代价与页码无关
+
+    Parameters:
+        keyset:排序键(created_at字段, id字段)
+
+    Returns:
+        Dict{
+            records:数据列表
+            pagination:{page_size, cursor, next_cursor}, next_cursor为None时表示已无下一页
+        }
+    """
+    created_at, pk = keyset
+    page_size = max(pagination.page_size, 1)
+
+    if pagination.cursor:
+        cursor_created_at, cursor_id = decode_cursor(pagination.cursor)
+        stmt = stmt.where(
+            tuple_(created_at, pk) < tuple_(cursor_created_at, cursor_id))
+
+    # 多取一条数据用于判断是否存在下一页
+    stmt = stmt.add_columns(
+        created_at.label(CURSOR_CREATED_AT),
+        pk.label(CURSOR_ID)
+    ).order_by(
+        created_at.desc(), pk.desc()
+    ).limit(page_size + 1)
+
+    records = fetch_records(session, stmt, format_rules)
+
+    next_cursor = None
+    if len(records) > page_size:
+        records = records[:page_size]
+        next_cursor = encode_cursor(
+            records[-1][CURSOR_CREATED_AT], records[-1][CURSOR_ID])
+
+    for record in records:
+        record.pop(CURSOR_CREATED_AT)
+        record.pop(CURSOR_ID)
+
+    pagination = dict(page_size=page_size,
+                      cursor=pagination.cursor,
+                      next_cursor=next_cursor)
+    return dict(records=records, pagination=pagination)
+
+
+def paginate(
+    session: Session,
+    stmt: Select,
+    pagination: Pagination,
+    order: list = None,
+    keyset: tuple[InstrumentedAttribute, InstrumentedAttribute] = None,
+    format_rules: list[ORMFormatRule | BatchFormatRule] = []
+) -> dict:
+    r"""分页查询数据,指定了游标且查询支持游标时使用游标分页,否则使用页码分页
+
+    Parameters:
+        session:数据库会话
+        stmt:查询语句
+        pagination:分页信息
+        order:页码分页的排序条件
+        keyset:游标分页的排序键(created_at字段, id字段),为None时不支持游标分页
+        format_rules:字段格式化规则(逐行或整页)
+    """
+    if pagination.cursor is not None and keyset is not None:
+        return keyset_pagination(session, stmt, pagination, keyset, format_rules)
+
+    return offset_pagination(session, stmt, pagination, order, format_rules)
@@ -0,0 +1,159 @@
+from collections import defaultdict
+from sqlalchemy import select, insert, update, delete, bindparam, func, or_
+from sqlalchemy.orm import Session
+from api.model.user import User
+from api.model.org import Org, OrgUser, OrgMember, OptOrgUserStatus
+from api.model.role import Role
+
+
+# 组织成员计数字段,按组织用户状态区分启用和禁用
+MEMBER_COUNTERS = {
+    OptOrgUserStatus.ENABLE.value: "member_enable",
+    OptOrgUserStatus.DISABLE.value: "member_disable",
+}
+
+
+def org_member_source():
+    r"""组织成员读模型的数据来源:有效的组织用户关联组织和账号信息
+    """
+    columns = {
+        OrgMember.id: OrgUser.id,
+        OrgMember.org_id: Org.id,
+        OrgMember.org_uuid: Org.org_uuid,
+        OrgMember.org_name: Org.org_name,
+        OrgMember.org_status: Org.org_status,
+        OrgMember.user_id: User.id,
+        OrgMember.user_uuid: User.user_uuid,
+        OrgMember.account: User.account,
+        OrgMember.nickname: User.nickname,
+        OrgMember.phone_enc: User.phone_enc,
+        OrgMember.account_status: User.account_status,
+        OrgMember.org_user_nickname: OrgUser.org_user_nickname,
+        OrgMember.org_avatar_url: OrgUser.org_avatar_url,
+        OrgMember.org_user_status: OrgUser.org_user_status,
+        OrgMember.created_at: OrgUser.created_at,
+        OrgMember.updated_at: OrgUser.updated_at,
+        OrgMember.is_deleted: OrgUser.is_deleted,
+    }
+
+    stmt = select(
+        *columns.values()
+    ).join(
+        Org, OrgUser.org_id == Org.id
+    ).join(
+        User, OrgUser.user_id == User.id
+    ).where(
+        OrgUser.is_deleted == False,
+        Org.is_deleted == False,
+        User.is_deleted == False
+    )
+    return [column.name for column in columns], stmt
+
+
+def update_org_counters(session: Session, deltas: dict[int, dict[str, int]]) -> None:
+    r"""按增量更新组织计数,不修改组织的更新时间
+
+    Parameters:
+        session:数据库会话
+        deltas:{组织ID:{计数字段:增量}}
+    """
+    fields = ["member_total", *MEMBER_COUNTERS.values(), "role_total"]
+    params = [dict(b_org_id=org_id, **{f"b_{field}": delta.get(field, 0) for field in fields})
+              for org_id, delta in deltas.items() if any(delta.values())]
+    if not params:
+        return
+
+    # 多组参数的ORM更新会按主键批量更新,这里使用表对象执行executemany
+    table = Org.__table__
+    stmt = update(table).where(table.c.id == bindparam("b_org_id")).values(
+        updated_at=table.c.updated_at,
+        **{field: table.c[field] + bindparam(f"b_{field}") for field in fields}
+    )
+    session.execute(stmt, params)
+
+
+def update_org_role_total(session: Session, org_uuid: str, delta: int) -> None:
+    r"""更新组织专属角色数,org_uuid为空(非组织专属角色)时不处理
+    """
+    if not org_uuid or not delta:
+        return
+
+    session.execute(update(Org).where(Org.org_uuid == org_uuid).values(
+        updated_at=Org.updated_at,
+        role_total=Org.role_total + delta
+    ))
+
+
+def recount_org_counters(session: Session, org_ids: list[int] = None) -> None:
+    r"""按读模型和角色表重新统计组织计数(数据迁移及修复计数时使用),org_ids为None时统计全部组织
+    """
+    def member_count(*expressions):
+        return select(func.count()).where(
+            OrgMember.org_id == Org.id, OrgMember.is_deleted == False, *expressions
+        ).scalar_subquery()
+
+    stmt = update(Org).values(
+        updated_at=Org.updated_at,
+        member_total=member_count(),
+        role_total=select(func.count()).where(
+            Role.role_org_uuid == Org.org_uuid, Role.is_deleted == False
+        ).scalar_subquery(),
+        **{field: member_count(OrgMember.org_user_status == status) for status, field in MEMBER_COUNTERS.items()}
+    ).execution_options(synchronize_session=False)
+    if org_ids is not None:
+        stmt = stmt.where(Org.id.in_(org_ids))
+
+    session.execute(stmt)
+
+
+def refresh_org_member(session: Session, org_ids: list[int] = None, user_ids: list[int] = None) -> None:
+    r"""增量刷新组织成员读模型及组织成员计数,需在写入源数据的事务中调用(不提交),与源数据一同提交或回滚
+
+    Parameters:
+        session:数据库会话
+        org_ids:需要刷新的组织ID
+        user_ids:需要刷新的用户ID
+        org_ids和user_ids均为None时重建全部数据
+    """
+    filters = [(ids, target, source) for ids, target, source in (
+        (org_ids, OrgMember.org_id, OrgUser.org_id),
+        (user_ids, OrgMember.user_id, OrgUser.user_id),
+    ) if ids is not None]
+
+    # 指定了刷新范围但范围为空
+    if filters and not any(ids for ids, _, _ in filters):
+        return
+
+    # 按ID顺序锁定涉及的组织行(计数更新同样需要该行锁),刷新相同组织成员的事务串行执行。
+    # 未加锁时,读已提交隔离级别下后执行的DELETE看不到另一事务刚提交的成员行,
+    # 随后的INSERT ... SELECT会违反uni_org_member
+    stmt_lock = select(Org.id).order_by(Org.id).with_for_update()
+    if filters:
+        stmt_lock = stmt_lock.where(or_(*[expression for condition, expression in (
+            (org_ids, Org.id.in_(org_ids or [])),
+            (user_ids, Org.id.in_(select(OrgUser.org_id).where(OrgUser.user_id.in_(user_ids or [])))),
+            (user_ids, Org.id.in_(select(OrgMember.org_id).where(OrgMember.user_id.in_(user_ids or [])))),
+        ) if condition]))
+    locked = session.scalars(stmt_lock).all()
+    if filters and not locked:
+        return
+
+    columns, stmt = org_member_source()
+    stmt_delete = delete(OrgMember).execution_options(synchronize_session=False)
+    if filters:
+        # 锁定后新加入的组织由加入组织的事务刷新,这里只处理已锁定的组织
+        stmt_delete = stmt_delete.where(or_(*[target.in_(ids) for ids, target, _ in filters]),
+                                        OrgMember.org_id.in_(locked))
+        stmt = stmt.where(or_(*[source.in_(ids) for ids, _, source in filters]), OrgUser.org_id.in_(locked))
+
+    returning = (OrgMember.org_id, OrgMember.org_user_status)
+    removed = session.execute(stmt_delete.returning(*returning)).all()
+    added = session.execute(insert(OrgMember).from_select(columns, stmt).returning(*returning)).all()
+
+    # 删除和重新插入的行相互抵消,只有成员增减或状态变化的组织产生增量
+    deltas = defaultdict(lambda: defaultdict(int))
+    for rows, sign in ((removed, -1), (added, 1)):
+        for org_id, org_user_status in rows:
+            deltas[org_id]["member_total"] += sign
+            deltas[org_id][MEMBER_COUNTERS[org_user_status]] += sign
+    update_org_counters(session, deltas)
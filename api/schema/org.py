@@ -94,20 +94,21 @@
 
 #         return ORM.one(session, stmt, fmt_rules)
 
-from dataclasses import asdict
-from sqlalchemy import select, or_
+from sqlalchemy import Select, select, or_
 from sqlalchemy.orm import Session
 from jhu.orm import ORM, ORMFormatRule
 from api.deps import Pagination
 from api.errcode import APIErr
-from api.security import server_aes_api, create_org_uuid
+from api.security import phone_cipher, create_org_uuid
 from api.model.user import User
-from api.model.org import Org, OrgUser, OptOrgStatus
+from api.model.org import Org, OrgUser, OrgMember, OptOrgStatus
+from api.schema.base import paginate, ilike_contains, insert_ignore
+from api.schema.member import refresh_org_member
 from api.schema.user import UserAPI
 
 
 fmt_rules = [
-    ORMFormatRule("phone", server_aes_api.phone_decrypt),
+    ORMFormatRule("phone", phone_cipher.decrypt),
 ]
 
 
@@ -115,7 +116,7 @@ def check_org_unique(session: Session, org_uuid: str, org_name: str = None, is_i
     """判断组织的唯一性
     """
     check_rules = {
-        Org.org_uuid.name: (is_insert, Org.org_uuid == org_uuid, APIErr.ORG_UUID_EXISTED),
+        Org.org_uuid.name: (org_uuid if is_insert else None, Org.org_uuid == org_uuid, APIErr.ORG_UUID_EXISTED),
         Org.org_name.name: (org_name, Org.org_name == org_name, APIErr.ORG_NAME_EXISTED),
     }
 
@@ -136,6 +137,20 @@ def check_org_unique(session: Session, org_uuid: str, org_name: str = None, is_i
     return APIErr.NO_ERROR
 
 
+def org_user_list_stmt(org_uuid: str) -> Select:
+    r"""组织用户列表查询语句(列表和导出共用),读取组织成员读模型,无需关联组织和用户表
+    """
+    return select(
+        OrgMember.org_user_nickname,
+        OrgMember.org_user_status,
+        OrgMember.account,
+        OrgMember.account_status
+    ).where(
+        OrgMember.is_deleted == False,
+        OrgMember.org_uuid == org_uuid
+    )
+
+
 class OrgAPI:
     @staticmethod
     def get_org_user_detail(
@@ -147,30 +162,24 @@ class OrgAPI:
         r"""获取组织用户详情
         """
         select_fields = [
-            OrgUser.org_user_nickname,
-            OrgUser.org_avatar_url,
-            OrgUser.org_user_status,
-            OrgUser.created_at,
-            OrgUser.updated_at,
-            User.account,
-            User.phone_enc.label("phone"),
-            User.user_status,
-            Org.org_name,
-            Org.org_status
+            OrgMember.org_user_nickname,
+            OrgMember.org_avatar_url,
+            OrgMember.org_user_status,
+            OrgMember.created_at,
+            OrgMember.updated_at,
+            OrgMember.account,
+            OrgMember.phone_enc.label("phone"),
+            OrgMember.account_status,
+            OrgMember.org_name,
+            OrgMember.org_status
         ] if not select_fields else select_fields
 
         stmt = select(
             *select_fields,
-        ).join(
-            Org, OrgUser.org_uuid == Org.org_uuid
-        ).join(
-            User, OrgUser.user_uuid == User.user_uuid
         ).where(
-            Org.is_deleted == False,
-            OrgUser.is_deleted == False,
-            User.is_deleted == False,
-            OrgUser.org_uuid == org_uuid,
-            OrgUser.user_uuid == user_uuid
+            OrgMember.is_deleted == False,
+            OrgMember.org_uuid == org_uuid,
+            OrgMember.user_uuid == user_uuid
         )
 
         return ORM.one(session, stmt, fmt_rules)
@@ -188,13 +197,17 @@ class OrgAPI:
             Org.org_name,
             Org.org_owner_uuid,
             Org.org_status,
+            Org.member_total,
+            Org.member_enable,
+            Org.member_disable,
+            Org.role_total,
             Org.created_at,
             Org.updated_at,
             User.nickname,
         ] if not select_fields else select_fields
 
         expressions = [expression for condition, expression in (
-            (org_name, Org.org_name.ilike(f"%{org_name}%")),
+            (org_name, ilike_contains(Org.org_name, org_name)),
             (org_status is not None, Org.org_status == org_status),
         ) if condition]
 
@@ -207,7 +220,9 @@ class OrgAPI:
             *expressions
         )
 
-        return ORM.pagination(session, stmt, **asdict(pagination), order=[Org.created_at.desc()])
+        return paginate(session, stmt, pagination,
+                        order=[Org.created_at.desc(), Org.id.desc()],
+                        keyset=(Org.created_at, Org.id))
 
     @staticmethod
     def get_org_detail(
@@ -219,6 +234,10 @@ class OrgAPI:
             Org.org_uuid,
             Org.org_name,
             Org.org_status,
+            Org.member_total,
+            Org.member_enable,
+            Org.member_disable,
+            Org.role_total,
             Org.created_at,
             Org.updated_at,
             User.nickname
@@ -241,33 +260,17 @@ class OrgAPI:
         pagination: Pagination,
         org_uuid: str
     ):
-        # 获取组织用户详情
-        stmt = select(
-            OrgUser.org_user_nickname,
-            OrgUser.org_user_status,
-            User.account,
-            User.account_status
-        ).join(
-            User, OrgUser.user_uuid == User.user_uuid
-        ).join(
-            Org, OrgUser.org_uuid == Org.org_uuid
-        ).where(
-            OrgUser.is_deleted == False,
-            OrgUser.org_uuid == org_uuid,
-            User.is_deleted == False,
-            Org.is_deleted == False
-        )
+        stmt = org_user_list_stmt(org_uuid)
 
-        return ORM.pagination(session, stmt, **asdict(pagination))
+        return paginate(session, stmt, pagination,
+                        order=[OrgMember.created_at.desc(), OrgMember.id.desc()],
+                        keyset=(OrgMember.created_at, OrgMember.id))
 
     @staticmethod
     def create_org(session: Session, org: Org) -> APIErr:
-        """创建组织
+        """创建组织,由唯一约束判断组织是否重复(UUID唯一,组织名称唯一),违反约束时才查询具体重复的字段
         """
-        org_uuid = create_org_uuid()
-        if (result := check_org_unique(session, org_uuid, org.org_name, True)) != APIErr.NO_ERROR:
-            return result
-        org.org_uuid = org_uuid
+        org.org_uuid = create_org_uuid()
 
         owner_info = UserAPI.get_account_detail(
             session, org.org_owner_uuid,
@@ -277,8 +280,10 @@ class OrgAPI:
             return APIErr.ORG_OWNER_NOT_EXISTED
 
         try:
-            session.add(org)
-            session.flush()
+            if insert_ignore(session, org) is None:
+                result = check_org_unique(session, org.org_uuid, org.org_name, True)
+                # 冲突数据已被并发删除时按组织名称重复返回
+                return APIErr.ORG_NAME_EXISTED if result == APIErr.NO_ERROR else result
 
             org_user = OrgUser(
                 org_id=org.id,
@@ -288,6 +293,8 @@ class OrgAPI:
             )
 
             session.add(org_user)
+            session.flush()
+            refresh_org_member(session, org_ids=[org.id])
             session.commit()
         except Exception as e:
             session.rollback()
@@ -0,0 +1,79 @@
+from sqlalchemy import select
+from jhu.orm import ORM, Session
+from api.cache import TTLCache
+from api.config import settings
+from api.model.app import App, AppService
+from api.model.permission import AppRole
+from api.model.role import Role, OrgUserRole, OptRoleStatus
+
+# 组织用户的授权范围缓存,key为(org_uuid, user_uuid)
+scope_cache = TTLCache(settings.scope_cache_size, settings.scope_cache_ttl)
+
+
+class PermissionAPI:
+    @staticmethod
+    def get_user_scopes(
+        session: Session,
+        org_uuid: str,
+        user_uuid: str
+    ) -> frozenset[str]:
+        r"""获取组织用户的授权范围(组织用户角色->应用角色->应用服务标识)
+        """
+        stmt = select(
+            AppService.service_identify
+        ).distinct().join_from(
+            OrgUserRole, Role, OrgUserRole.role_id == Role.id
+        ).join(
+            AppRole, AppRole.role_id == Role.id
+        ).join(
+            App, AppRole.app_id == App.id
+        ).join(
+            AppService, AppService.app_uuid == App.app_uuid
+        ).where(
+            OrgUserRole.is_deleted == False,
+            OrgUserRole.org_uuid == org_uuid,
+            OrgUserRole.user_uuid == user_uuid,
+            Role.is_deleted == False,
+            Role.role_status == OptRoleStatus.ENABLE.value,
+            Role.role_org_uuid.in_(["", org_uuid]),
+            AppRole.is_deleted == False,
+            App.is_deleted == False,
+            AppService.is_deleted == False,
+            AppService.is_enable == True
+        )
+
+        return frozenset(row["service_identify"] for row in ORM.mapping(session, stmt))
+
+    @staticmethod
+    def get_cached_scopes(org_uuid: str, user_uuid: str) -> frozenset[str] | None:
+        r"""获取缓存中的授权范围,未缓存时返回None
+        """
+        if not org_uuid:
+            return frozenset()
+        return scope_cache.get((org_uuid, user_uuid))
+
+    @staticmethod
+    def get_actor_scopes(
+        session: Session,
+        org_uuid: str,
+        user_uuid: str
+    ) -> frozenset[str]:
+        r"""获取组织用户的授权范围,优先读取缓存,未登录组织时无授权范围
+        """
+        if not org_uuid:
+            return frozenset()
+
+        key = (org_uuid, user_uuid)
+        if (scopes := scope_cache.get(key)) is None:
+            scopes = PermissionAPI.get_user_scopes(session, org_uuid, user_uuid)
+            scope_cache.set(key, scopes)
+        return scopes
+
+    @staticmethod
+    def invalidate_actor_scopes(org_uuid: str = None, user_uuid: str = None) -> None:
+        r"""角色或授权变更后使授权范围缓存失效,未同时指定组织和用户时清空所有缓存
+        """
+        if org_uuid and user_uuid:
+            scope_cache.pop((org_uuid, user_uuid))
+        else:
+            scope_cache.clear()
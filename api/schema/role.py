@@ -1,9 +1,12 @@
-from dataclasses import asdict
 from sqlalchemy import select, update
 from jhu.orm import ORM, Session
 from api.deps import Pagination
 from api.errcode import APIErr
+from api.model.app import App
 from api.model.role import Role, OptRoleStatus
+from api.schema.base import paginate
+from api.schema.member import update_org_role_total
+from api.schema.permission import PermissionAPI
 
 
 def check_role_unique(session: Session, role_name: str, role_org_uuid: str, role_id: int = None) -> APIErr:
@@ -50,14 +53,18 @@ class RoleAPI:
 
         stmt = select(
             *select_fields
+        ).join(
+            App, Role.app_uuid == App.app_uuid
         ).where(
             Role.is_deleted == False,
-            Role.app_id == app_id,
+            App.id == app_id,
             Role.role_org_uuid == "",
             *expressions
         )
 
-        return ORM.pagination(session, stmt, **asdict(pagination), order=[Role.updated_at.desc()])
+        return paginate(session, stmt, pagination,
+                        order=[Role.updated_at.desc()],
+                        keyset=(Role.created_at, Role.id))
 
     @staticmethod
     def get_role_detail(
@@ -92,6 +99,7 @@ class RoleAPI:
 
         try:
             session.add(role)
+            update_org_role_total(session, role.role_org_uuid, 1)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -122,6 +130,9 @@ class RoleAPI:
             session.rollback()
             raise e
 
+        # 角色状态可能变更,授权范围缓存失效
+        PermissionAPI.invalidate_actor_scopes()
+
         return APIErr.NO_ERROR
 
     @staticmethod
@@ -131,11 +142,15 @@ class RoleAPI:
     ) -> APIErr:
         try:
             stmt = update(Role).where(
-                Role.id == role_id).values(is_deleted=True)
-            session.execute(stmt)
+                Role.id == role_id, Role.is_deleted == False
+            ).values(is_deleted=True).returning(Role.role_org_uuid)
+            for role_org_uuid in session.scalars(stmt).all():
+                update_org_role_total(session, role_org_uuid, -1)
             session.commit()
         except Exception as e:
             session.rollback()
             raise e
 
+        PermissionAPI.invalidate_actor_scopes()
+
         return APIErr.NO_ERROR
@@ -1,38 +1,44 @@
-from dataclasses import asdict
 from jhu.orm import ORM, ORMFormatRule
-from sqlalchemy import select, update, or_
+from sqlalchemy import Select, select, insert, update, join, and_, or_
 from sqlalchemy.orm import Session
 from api.config import settings
-from api.deps import Pagination
+from api.deps import Pagination, OptPhoneListMode
 from api.errcode import APIErr
-from api.security import server_aes_api, hash_api, create_usr_uuid
+from api.security import phone_cipher, phone_blind_index, hash_api, create_usr_uuid
 from api.model.user import User, UserAuth, OptAccountStatus, OptUserAuthType
 from api.model.org import Org, OrgUser, OptOrgStatus
+from api.schema.member import refresh_org_member
+from api.schema.base import BatchFormatRule, paginate, ilike_contains, insert_ignore, update_rows_stmt
 
 
 fmt_rules = [
-    ORMFormatRule("phone", server_aes_api.phone_decrypt),
+    ORMFormatRule("phone", phone_cipher.decrypt),
+]
+
+# 列表按整页批量解密手机号
+list_fmt_rules = [
+    BatchFormatRule("phone", phone_cipher.decrypt_many),
 ]
 
 
-def check_account_unique(session: Session, user_uuid: str, account: str = None, phone_enc: str = None, is_insert: bool = False) -> APIErr:
-    r"""判断账号是否重复(UUID唯一,账号唯一,手机号唯一)
+def check_account_unique(session: Session, user_uuid: str, account: str = None, phone_bidx: str = None, is_insert: bool = False) -> APIErr:
+    r"""判断账号是否重复(UUID唯一,账号唯一,手机号唯一),手机号通过盲索引判断
     """
 
     # 唯一性逻辑判断规则,uuid,账号,手机号唯一
     check_rules = {
         # 表字段:(唯一性检测条件变量,SQL条件语句,异常返回码)
-        User.user_uuid.name: (is_insert, User.user_uuid == user_uuid, APIErr.USER_UUID_EXISTED),
+        User.user_uuid.name: (user_uuid if is_insert else None, User.user_uuid == user_uuid, APIErr.USER_UUID_EXISTED),
         User.account.name: (account, User.account == account, APIErr.ACCOUNT_EXISTSED),
-        User.phone_enc.name: (phone_enc, User.phone_enc == phone_enc, APIErr.PHONE_EXISTED),
+        User.phone_bidx.name: (phone_bidx, User.phone_bidx == phone_bidx, APIErr.PHONE_EXISTED),
     }
 
     if is_insert:
         # 新增情况下的逻辑
-        stmt = select(User.user_uuid, User.account, User.phone_enc)
+        stmt = select(User.user_uuid, User.account, User.phone_bidx)
     else:
         # 修改情况下的逻辑
-        stmt = select(User.account, User.phone_enc).where(
+        stmt = select(User.account, User.phone_bidx).where(
             User.user_uuid != user_uuid)
 
     # 逻辑删除数据不要
@@ -69,6 +75,62 @@ def check_superadmin_account(session: Session, user_uuid: str) -> bool:
     return ORM.counts(session, stmt) > 0
 
 
+def get_superadmin_accounts(session: Session, user_uuids: list[str]) -> list[str]:
+    r"""一次查询返回账号列表中的超级管理员账号UUID
+    """
+    stmt = select(
+        User.user_uuid
+    ).join(
+        Org, User.user_uuid == Org.org_owner_uuid
+    ).where(
+        User.is_deleted == False,
+        Org.is_deleted == False,
+        Org.is_admin == True,
+        User.user_uuid.in_(user_uuids)
+    ).distinct()
+
+    return session.scalars(stmt).all()
+
+
+def account_list_stmt(
+    account: str = None,
+    nickname: str = None,
+    account_status: OptAccountStatus = None,
+    select_fields: list = None,
+    phone: str = None
+) -> Select:
+    r"""账号列表查询语句(列表和导出共用)
+    """
+    select_fields = [
+        User.user_uuid,
+        User.account,
+        User.nickname,
+        User.phone_enc.label("phone"),
+        User.account_status,
+        User.created_at,
+        User.updated_at
+    ] if not select_fields else select_fields
+
+    # 列表不返回手机号时不查询手机号,也不需要解密
+    if OptPhoneListMode(settings.phone_list_mode) == OptPhoneListMode.OMIT:
+        select_fields = [field for field in select_fields if getattr(field, "name", None) != "phone"]
+
+    expresions = [expression for condition, expression in (
+        (account, ilike_contains(User.account, account)),
+        (nickname, ilike_contains(User.nickname, nickname)),
+        (account_status is not None, User.account_status == account_status),
+        # 手机号精确匹配(盲索引)
+        (phone, User.phone_bidx == phone_blind_index(phone))
+    ) if condition]
+
+    return select(
+        *select_fields
+    ).where(
+        User.is_deleted == False,
+        *expresions
+    )
+
+
 class UserAPI:
     @staticmethod
     def get_account_auth_info(
@@ -109,6 +171,73 @@ class UserAPI:
 
         return ORM.one(session, stmt)
 
+    @staticmethod
+    def get_login_info(
+        session: Session,
+        account: str,
+        org_uuid: str = None,
+        auth_type: OptUserAuthType = OptUserAuthType.PASSWORD,
+        auth_identify: str = ""
+    ) -> dict | None:
+        r"""获取登录所需信息,一次查询获取账号认证信息及其所属组织
+
+        Parameters:
+            session:数据库会话
+            account:账号
+            org_uuid:指定登录的组织UUID,为空时查询用户所属的组织
+            auth_type:认证类型,默认为密码
+            auth_identify:认证类型标识,默认为空
+
+        Returns:
+            None:无数据
+            Dict:用户登录信息{
+                user_uuid:用户uuid
+                account_status:用户账号状态
+                auth_value:账号认证值
+                orgs:所属组织列表[{org_uuid, org_owner_uuid, org_user_status}],
+                     未指定组织时最多返回2个,仅用于判断是否只属于一个组织
+            }
+        """
+        # 用户所属的有效组织,使用嵌套连接(而非子查询)以便按用户走索引关联
+        memberships = join(
+            OrgUser, Org,
+            and_(
+                OrgUser.org_id == Org.id,
+                Org.is_deleted == False,
+                Org.org_status == OptOrgStatus.ENABLE.value,
+                *([Org.org_uuid == org_uuid] if org_uuid else [])
+            )
+        )
+
+        stmt = select(
+            User.user_uuid,
+            User.account_status,
+            UserAuth.auth_value,
+            Org.org_uuid,
+            Org.org_owner_uuid,
+            OrgUser.org_user_status
+        ).join(
+            UserAuth, User.id == UserAuth.user_id
+        ).outerjoin(
+            memberships, and_(OrgUser.user_id == User.id, OrgUser.is_deleted == False)
+        ).where(
+            User.is_deleted == False,
+            UserAuth.is_deleted == False,
+            User.account == account,
+            UserAuth.auth_type == auth_type.value,
+            UserAuth.auth_identify == auth_identify
+        ).limit(2)
+
+        rows = ORM.all(session, stmt)
+        if not rows:
+            return None
+
+        org_fields = ("org_uuid", "org_owner_uuid", "org_user_status")
+        return dict(user_uuid=rows[0]["user_uuid"],
+                    account_status=rows[0]["account_status"],
+                    auth_value=rows[0]["auth_value"],
+                    orgs=[{field: row[field] for field in org_fields} for row in rows if row["org_uuid"]])
+
     @staticmethod
     def get_user_org_list(
         session: Session,
@@ -146,36 +275,17 @@ class UserAPI:
         account: str = None,
         nickname: str = None,
         account_status: OptAccountStatus = None,
-        select_fields: list = None
+        select_fields: list = None,
+        phone: str = None
     ):
-        select_fields = [
-            User.user_uuid,
-            User.account,
-            User.nickname,
-            User.phone_enc.label("phone"),
-            User.account_status,
-            User.created_at,
-            User.updated_at
-        ] if not select_fields else select_fields
+        stmt = account_list_stmt(account, nickname, account_status, select_fields, phone)
 
-        expresions = [expression for condition, expression in (
-            (account is not None, User.account.ilike(f"%{account}%")),
-            (nickname is not None, User.nickname.ilike(f"%{nickname}%")),
-            (account_status is not None, User.account_status == account_status)
-        ) if condition]
-
-        stmt = select(
-            *select_fields
-        ).where(
-            User.is_deleted == False,
-            *expresions
-        )
-
-        return ORM.pagination(session,
-                              stmt,
-                              **asdict(pagination),
-                              order=[User.created_at.desc()],
-                              format_rules=fmt_rules)
+        return paginate(session,
+                        stmt,
+                        pagination,
+                        order=[User.created_at.desc(), User.id.desc()],
+                        keyset=(User.created_at, User.id),
+                        format_rules=list_fmt_rules)
 
     @staticmethod
     def get_account_detail(
@@ -212,18 +322,15 @@ class UserAPI:
         user_auth: UserAuth = None
     ) -> APIErr:
         r"""创建账号,user_uuid会自动生成,不用输入
+        由唯一约束判断账号是否重复(UUID唯一,账号唯一,手机号唯一),违反约束时才查询具体重复的字段
         """
-        user_uuid = create_usr_uuid()
-
-        # 唯一性判断
-        if (result := check_account_unique(session, user_uuid, user.account, user.phone_enc, is_insert=True)) != APIErr.NO_ERROR:
-            return result
-
-        user.user_uuid = user_uuid
+        user.user_uuid = create_usr_uuid()
 
         try:
-            session.add(user)
-            session.flush()
+            if insert_ignore(session, user) is None:
+                result = check_account_unique(session, user.user_uuid, user.account, user.phone_bidx, is_insert=True)
+                # 冲突数据已被并发删除时按账号重复返回
+                return APIErr.ACCOUNT_EXISTSED if result == APIErr.NO_ERROR else result
 
             # 认证类型设定
             if user_auth:
@@ -240,6 +347,91 @@ class UserAPI:
 
         return APIErr.NO_ERROR
 
+    @staticmethod
+    def check_import_accounts(
+        session: Session,
+        users: list[dict]
+    ) -> list[tuple[int, dict]]:
+        r"""批量导入前的唯一性判断,一次查询完成整批数据的判断(UUID唯一,账号唯一,手机号唯一)
+
+        Parameters:
+            session:数据库会话
+            users:账号列表[{account, nickname, phone_enc, phone_bidx, account_status}],user_uuid会自动生成
+
+        Returns:
+            未通过的数据列表[(users中的序号, 异常返回码)]
+        """
+        for user in users:
+            user["user_uuid"] = create_usr_uuid()
+
+        # 唯一性判断字段:异常返回码
+        check_rules = {
+            User.user_uuid.name: APIErr.USER_UUID_EXISTED,
+            User.account.name: APIErr.ACCOUNT_EXISTSED,
+            User.phone_bidx.name: APIErr.PHONE_EXISTED,
+        }
+        existed = {field: set() for field in check_rules}
+
+        stmt = select(
+            User.user_uuid,
+            User.account,
+            User.phone_bidx
+        ).where(
+            User.is_deleted == False,
+            or_(*[getattr(User, field).in_(values) for field in check_rules
+                  if (values := {user[field] for user in users if user[field]})])
+        )
+
+        for row in ORM.mapping(session, stmt):
+            for field, values in existed.items():
+                values.add(row[field])
+
+        # 逐条判断,同一批次内重复的数据以先出现的为准
+        errors = []
+        for idx, user in enumerate(users):
+            for field, err in check_rules.items():
+                if user[field] and user[field] in existed[field]:
+                    errors.append((idx, err))
+                    break
+            else:
+                for field, values in existed.items():
+                    values.add(user[field])
+
+        return errors
+
+    @staticmethod
+    def insert_accounts(
+        session: Session,
+        users: list[dict]
+    ) -> None:
+        r"""多行插入已通过唯一性判断的账号及其认证信息后提交,违反唯一约束(并发导入)时整批回滚并抛出异常
+
+        Parameters:
+            session:数据库会话
+            users:账号列表[{user_uuid, account, nickname, phone_enc, phone_bidx, account_status, auth_value}]
+        """
+        if not users:
+            return
+
+        try:
+            user_ids = session.scalars(
+                insert(User).returning(User.id, sort_by_parameter_order=True),
+                [dict(user_uuid=user["user_uuid"],
+                      account=user["account"],
+                      nickname=user["nickname"],
+                      phone_enc=user["phone_enc"],
+                      phone_bidx=user["phone_bidx"],
+                      account_status=user["account_status"]) for user in users]
+            ).all()
+
+            session.execute(insert(UserAuth),
+                            [dict(user_id=user_id, auth_value=user["auth_value"])
+                             for user_id, user in zip(user_ids, users)])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+
     @staticmethod
     def update_account(
         session: Session,
@@ -257,10 +449,11 @@ class UserAPI:
         stmt = update(User).where(User.user_uuid == user_uuid).values(
             nickname=nickname,
             account_status=account_status.value
-        )
+        ).returning(User.id)
 
         try:
-            session.execute(stmt)
+            user_ids = session.scalars(stmt).all()
+            refresh_org_member(session, user_ids=user_ids)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -281,15 +474,76 @@ class UserAPI:
 
         try:
             # 释放账号
-            for stmt in (update(User).where(User.user_uuid == user_uuid).values(is_deleted=True, account=user_uuid),
-                         update(UserAuth).where(UserAuth.user_uuid ==
-                                                user_uuid).values(is_deleted=True)
-                         ):
-                session.execute(stmt)
-
+            user_ids = session.scalars(update(User).where(
+                User.user_uuid == user_uuid, User.is_deleted == False
+            ).values(is_deleted=True, account=user_uuid).returning(User.id)).all()
+
+            if user_ids:
+                session.execute(update(UserAuth).where(
+                    UserAuth.user_id.in_(user_ids)).values(is_deleted=True))
+            refresh_org_member(session, user_ids=user_ids)
             session.commit()
         except Exception as e:
             session.rollback()
             raise e
 
         return APIErr.NO_ERROR
+
+    @staticmethod
+    def batch_update_account(
+        session: Session,
+        accounts: list[dict]
+    ) -> dict:
+        r"""批量修改账号,一次超级管理员判断,一条UPDATE语句完成修改(每个账号的修改值不同)
+
+        Parameters:
+            accounts:[{user_uuid, nickname, account_status}]
+
+        Returns:
+            返回码,包含超级管理员账号时整批不修改,data为超级管理员账号UUID列表,否则data为修改的账号数
+        """
+        if superadmins := get_superadmin_accounts(session, [account["user_uuid"] for account in accounts]):
+            return dict(**APIErr.SUPERADMIN_PROTECT, data=superadmins)
+
+        stmt = update_rows_stmt(User, User.user_uuid.name, accounts).where(
+            User.is_deleted == False).returning(User.id)
+
+        try:
+            user_ids = session.scalars(stmt).all()
+            refresh_org_member(session, user_ids=user_ids)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+
+        return dict(**APIErr.NO_ERROR, data=len(user_ids))
+
+    @staticmethod
+    def batch_delete_account(
+        session: Session,
+        user_uuids: list[str]
+    ) -> dict:
+        r"""批量删除账号,一次超级管理员判断,账号和认证信息各一条UPDATE语句完成删除
+
+        Returns:
+            返回码,包含超级管理员账号时整批不删除,data为超级管理员账号UUID列表,否则data为删除的账号数
+        """
+        if superadmins := get_superadmin_accounts(session, user_uuids):
+            return dict(**APIErr.SUPERADMIN_PROTECT, data=superadmins)
+
+        try:
+            # 释放账号
+            user_ids = session.scalars(update(User).where(
+                User.user_uuid.in_(user_uuids), User.is_deleted == False
+            ).values(is_deleted=True, account=User.user_uuid).returning(User.id)).all()
+
+            if user_ids:
+                session.execute(update(UserAuth).where(
+                    UserAuth.user_id.in_(user_ids)).values(is_deleted=True))
+            refresh_org_member(session, user_ids=user_ids)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+
+        return dict(**APIErr.NO_ERROR, data=len(user_ids))
@@ -1,6 +1,15 @@
+import asyncio
+import hmac
+from hashlib import sha256
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+from typing import Callable
 from uuid import uuid4
 from jhu.security import AESAPI, HashAPI, JWTAPI
+from api.cache import TTLCache
 from api.config import settings
+from api.metrics import HASH_VERIFY_DURATION
 
 
 hash_api = HashAPI()
@@ -9,6 +18,149 @@ server_aes_api = AESAPI(settings.aes_key_16)
 jwt_api = JWTAPI(settings.jwt_key, expire_min=settings.jwt_expire_min)
 
 
+class HashPoolBusy(Exception):
+    r"""哈希计算任务已达排队上限
+    """
+
+
+class HashPool:
+    r"""密码哈希专用执行器,bcrypt计算不占用请求线程池和事件循环
+
+    Parameters:
+        workers:执行哈希计算的线程(进程)数
+        queue_size:等待执行的任务上限,超出时抛出HashPoolBusy
+        process:是否使用进程池
+    """
+
+    def __init__(self, workers: int, queue_size: int, process: bool = False) -> None:
+        self.workers = workers
+        self.process = process
+        self._slots = BoundedSemaphore(workers + queue_size)
+        self._executor: Executor | None = None
+        self._lock = Lock()
+
+    @property
+    def executor(self) -> Executor:
+        # 首次使用时创建,避免导入模块时创建进程
+        with self._lock:
+            if self._executor is None:
+                if self.process:
+                    self._executor = ProcessPoolExecutor(self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="hash")
+            return self._executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        r"""提交哈希计算任务,排队已满时抛出HashPoolBusy
+        """
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolBusy("登录请求繁忙,请稍后再试")
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception as e:
+            self._slots.release()
+            raise e
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def verify(self, plain_text: str, hash_text: str) -> bool:
+        r"""验证明文和密文的内容是否一致
+        """
+        future = self.submit(hash_api.verify, plain_text, hash_text)
+        start = perf_counter()
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            HASH_VERIFY_DURATION.observe(perf_counter() - start)
+
+    async def hash(self, plain_text: str) -> str:
+        r"""明文哈希加密
+        """
+        return await asyncio.wrap_future(self.submit(hash_api.hash, plain_text))
+
+    async def hash_many(self, plain_texts: list[str]) -> list[str]:
+        r"""批量哈希加密,同时最多提交workers个任务,不占满排队空间
+        """
+        results = []
+        for start in range(0, len(plain_texts), self.workers):
+            results.extend(await asyncio.gather(
+                *(self.hash(plain_text) for plain_text in plain_texts[start:start + self.workers])))
+        return results
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hash_pool = HashPool(settings.hash_workers,
+                     settings.hash_queue_size,
+                     settings.hash_process_pool)
+
+
+class PhoneCipher:
+    r"""手机号解密,按密文段缓存解密结果
+
+    手机号密文由每3位数字的密文段拼接而成,ECB模式下相同明文段的密文相同,
+    同一密钥下的密文段最多只有1000种,缓存后解密只需查表
+
+    Parameters:
+        aes:手机号加密使用的AES对象
+        cache_size:密文段缓存数量上限
+    """
+
+    def __init__(self, aes: AESAPI, cache_size: int) -> None:
+        self.aes = aes
+        self._cache = TTLCache(cache_size)
+
+    def decrypt_segments(self, segments: set[str]) -> dict[str, str]:
+        r"""解密密文段,返回{密文段:明文段}
+        """
+        result = {}
+        for segment in segments:
+            if (plain_text := self._cache.get(segment)) is None:
+                plain_text = self.aes.decrypt(segment)
+                self._cache.set(segment, plain_text)
+            result[segment] = plain_text
+        return result
+
+    def decrypt(self, encrypted_text: str, mask: bool = True) -> str:
+        r"""解密手机号,结果与AESAPI.phone_decrypt一致
+        """
+        return self.decrypt_many([encrypted_text], mask)[0]
+
+    def decrypt_many(self, encrypted_texts: list[str], mask: bool = True) -> list[str]:
+        r"""批量解密手机号,整批数据所需的密文段去重后统一解密
+        """
+        # 明文由前8段的首位和最后一段组成,只需解密这些段
+        segments = [text.split(",") if text else [] for text in encrypted_texts]
+        segments = [phone[:8] + phone[-1:] for phone in segments]
+        plain_texts = self.decrypt_segments({segment for phone in segments for segment in phone})
+
+        result = []
+        for phone in segments:
+            if not phone:
+                result.append("")
+                continue
+            plain_text = "".join(plain_texts[segment][0] for segment in phone[:-1]) + plain_texts[phone[-1]]
+            result.append(f"{plain_text[:3]}****{plain_text[7:]}" if mask else plain_text)
+        return result
+
+
+phone_cipher = PhoneCipher(server_aes_api, settings.phone_cache_size)
+
+
+def phone_blind_index(phone: str) -> str:
+    r"""手机号盲索引,使用HMAC-SHA256计算,可用于等值查询且不暴露明文
+    """
+    if not phone:
+        return ""
+    return hmac.new(settings.phone_bidx_key.encode(), phone.encode(), sha256).hexdigest()
+
+
 def create_uuid() -> str:
     """随机创建一个uuid
     """
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from . import account, app, auth, user, org, role
+from api.deps import scope_registry
+from . import account, app, auth, user, org, role, system
 
 routers = APIRouter()
 permissions = []
@@ -11,6 +12,7 @@ for api, tags, api_permission in [
     (app.api, ["应用服务"], app.permission),
     (org.api, ["组织服务"], org.permission),
     # (role.api, ["角色服务"], role.permission),
+    (system.api, ["系统服务"], system.permission),
 ]:
     routers.include_router(api, tags=tags)
 
@@ -18,3 +20,6 @@ for api, tags, api_permission in [
         continue
     for permission in api_permission:
         permissions.append(permission)
+
+# 权限位图按注册顺序编号,新增权限请追加在列表末尾
+scope_registry.load([permission.scope for permission in permissions])
@@ -1,9 +1,20 @@
-from pydantic import BaseModel, Field
-from fastapi import APIRouter, HTTPException, Security, Depends, Query, Body
-from api.deps import Permission, Rsp, get_actor_info, get_page_info
-from api.security import server_aes_api
-from api.model.user import User, OptAccountStatus
-from api.schema.user import UserAPI
+import csv
+import json
+from enum import Enum
+from io import TextIOWrapper
+from itertools import islice
+from typing import Iterator, IO
+from pydantic import BaseModel, Field, ValidationError
+from fastapi import APIRouter, HTTPException, Security, Depends, Query, Body, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from api.deps import Permission, Rsp, Page, OptExportFormat, get_actor_info, get_page_info, run_query
+from api.config import settings
+from api.errcode import APIErr
+from api.export import export_response
+from api.security import HashPoolBusy, client_aes_api, server_aes_api, hash_pool, phone_blind_index
+from api.model.user import User, UserAuth, OptAccountStatus
+from api.schema.user import UserAPI, account_list_stmt, list_fmt_rules
 
 # 路由对象
 api = APIRouter(prefix="/account")
@@ -14,7 +25,11 @@ permission = [
     API_DETAIL := Permission(path="/detail", name="获取账号详情", scope="account:detail"),
     API_CREATE := Permission(path="/create", name="创建账号", scope="account:create"),
     API_UPDATE := Permission(path="/update", name="更新账号", scope="account:update"),
-    API_DELETE := Permission(path="/delete", name="删除账号", scope="account:delete")
+    API_DELETE := Permission(path="/delete", name="删除账号", scope="account:delete"),
+    API_IMPORT := Permission(path="/import", name="批量导入账号", scope="account:import"),
+    API_EXPORT := Permission(path="/export", name="导出账号", scope="account:export"),
+    API_BATCH_UPDATE := Permission(path="/batch_update", name="批量更新账号", scope="account:batch_update"),
+    API_BATCH_DELETE := Permission(path="/batch_delete", name="批量删除账号", scope="account:batch_delete"),
 ]
 
 
@@ -33,6 +48,17 @@ class AccountCreate(BaseModel):
                                              default=OptAccountStatus.ENABLE)
 
 
+class AccountImport(AccountCreate):
+    password_enc: str = Field(description="密码(需加密),为空时使用默认密码",
+                              default="",
+                              max_length=UserAuth.auth_value.type.length)
+
+
+class OptImportFormat(str, Enum):
+    CSV: str = "csv"
+    JSONL: str = "jsonl"
+
+
 class AccountUpdate(BaseModel):
     user_uuid: str = Field(description=User.user_uuid.comment)
     nickname: str = Field(description=User.nickname.comment,
@@ -46,37 +72,91 @@ class AccountDelete(BaseModel):
     user_uuid: str = Field(description=User.user_uuid.comment)
 
 
+class AccountBatchUpdate(BaseModel):
+    accounts: list[AccountUpdate] = Field(description="账号列表,同一账号出现多次时以最后一次为准",
+                                          min_length=1,
+                                          max_length=settings.account_batch_limit)
+
+
+class AccountBatchDelete(BaseModel):
+    user_uuids: list[str] = Field(description="账号UUID列表",
+                                  min_length=1,
+                                  max_length=settings.account_batch_limit)
+
+
+class AccountItem(BaseModel):
+    user_uuid: str = Field(description=User.user_uuid.comment)
+    account: str = Field(description=User.account.comment)
+    nickname: str = Field(description=User.nickname.comment)
+    phone: str | None = Field(description="手机号(脱敏),配置为不返回手机号时为空", default=None)
+    account_status: OptAccountStatus = Field(description=User.account_status.comment)
+    created_at: str = Field(description=User.created_at.comment)
+    updated_at: str = Field(description=User.updated_at.comment)
+
+
+class AccountDetail(BaseModel):
+    account: str = Field(description=User.account.comment)
+    nickname: str = Field(description=User.nickname.comment)
+    phone: str = Field(description="手机号(脱敏)")
+    account_status: OptAccountStatus = Field(description=User.account_status.comment)
+    avatar_url: str = Field(description=User.avatar_url.comment)
+    created_at: str = Field(description=User.created_at.comment)
+    updated_at: str = Field(description=User.updated_at.comment)
+
+
 @api.get(API_LIST.path, summary=API_LIST.name)
-def get_account_list(
+async def get_account_list(
         actor=Security(get_actor_info, scopes=[API_LIST.scope]),
         pagination=Depends(get_page_info),
         account: str = Query(default=None, description=User.account.comment),
         nickname: str = Query(default=None, description=User.nickname.comment),
         account_status: OptAccountStatus = Query(
-            default=None, description=User.account_status.comment)
-) -> Rsp:
+            default=None, description=User.account_status.comment),
+        phone: str = Query(default=None, description="手机号(精确匹配)",
+                           pattern=r"^1[3-9]\d{9}$")
+) -> Rsp[Page[AccountItem]]:
     try:
-        data = UserAPI.get_account_list(
-            actor.session, pagination, account, nickname, account_status)
+        data = await run_query(
+            actor.session, UserAPI.get_account_list, pagination, account, nickname, account_status, phone=phone)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
+@api.get(API_EXPORT.path, summary=API_EXPORT.name)
+async def export_account(
+        actor=Security(get_actor_info, scopes=[API_EXPORT.scope]),
+        export_format: OptExportFormat = Query(default=OptExportFormat.NDJSON, description="导出格式"),
+        account: str = Query(default=None, description=User.account.comment),
+        nickname: str = Query(default=None, description=User.nickname.comment),
+        account_status: OptAccountStatus = Query(
+            default=None, description=User.account_status.comment),
+        phone: str = Query(default=None, description="手机号(精确匹配)",
+                           pattern=r"^1[3-9]\d{9}$")
+) -> StreamingResponse:
+    try:
+        stmt = account_list_stmt(account, nickname, account_status, phone=phone).order_by(
+            User.created_at.desc(), User.id.desc())
+        rsp = export_response(stmt, export_format, "account", list_fmt_rules)
+    except Exception as e:
+        raise HTTPException(500, f"{e}")
+    return rsp
+
+
 @api.get(API_DETAIL.path, summary=API_DETAIL.name)
-def get_account_detail(
+async def get_account_detail(
     actor=Security(get_actor_info, scopes=[API_DETAIL.scope]),
     user_uuid: str = Query(description=User.user_uuid.comment)
-) -> Rsp:
+) -> Rsp[AccountDetail]:
     try:
-        data = UserAPI.get_account_detail(actor.session, user_uuid)
+        data = await run_query(actor.session, UserAPI.get_account_detail, user_uuid)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
 @api.post(API_CREATE.path, summary=API_CREATE.name)
-def create_account(
+async def create_account(
     actor=Security(get_actor_info, scopes=[API_CREATE.scope]),
     req_data: AccountCreate = Body()
 ) -> Rsp:
@@ -88,34 +168,210 @@ def create_account(
         user = User(account=req_data.account,
                     nickname=req_data.nickname,
                     account_status=req_data.account_status,
-                    phone_enc=phone_enc)
+                    phone_enc=phone_enc,
+                    phone_bidx=phone_blind_index(req_data.phone))
+
+        # 默认密码的哈希在哈希执行器中计算
+        user_auth = UserAuth(auth_value=await hash_pool.hash(settings.default_passwd))
 
-        result = UserAPI.create_account(actor.session, user)
+        result = await run_query(actor.session, UserAPI.create_account, user, user_auth)
+    except HashPoolBusy as e:
+        raise HTTPException(503, f"{e}")
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(**result)
 
 
+def iter_import_rows(file: IO[bytes], file_format: OptImportFormat) -> Iterator[tuple[int, dict | None]]:
+    r"""逐行读取导入文件,返回(行号, 数据),无法解析的行数据为None
+    """
+    text = TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+    if file_format == OptImportFormat.CSV:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_num, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_num, row if isinstance(row, dict) else None
+
+
+def read_import_batch(rows: Iterator[tuple[int, dict | None]], size: int) -> tuple[list, Exception | None]:
+    r"""读取一批导入数据,返回(数据, 异常),读取失败(如编码错误)时返回已读取的数据及异常
+    """
+    batch = []
+    try:
+        for item in islice(rows, size):
+            batch.append(item)
+    except Exception as e:
+        return batch, e
+    return batch, None
+
+
+def parse_import_row(row: dict | None) -> tuple[dict, str | None]:
+    r"""校验导入的账号数据,返回(账号数据, 密码明文),密码为空时返回None
+    """
+    if row is None:
+        raise ValueError("无法解析该行数据")
+
+    # CSV中的空值按未填写处理
+    data = AccountImport.model_validate(
+        {k: v for k, v in row.items() if k and v not in ("", None)})
+
+    user = dict(account=data.account,
+                nickname=data.nickname,
+                phone_enc=server_aes_api.phone_encrypt(data.phone) if data.phone else "",
+                phone_bidx=phone_blind_index(data.phone),
+                account_status=data.account_status.value)
+    password = client_aes_api.decrypt(data.password_enc) if data.password_enc else None
+    return user, password
+
+
+def import_error(line_num: int, row: dict | None, err: dict, detail: str = "") -> dict:
+    message = f"{err['message']}:{detail}" if detail else err["message"]
+    return dict(line=line_num,
+                account=row.get("account") if row else None,
+                code=err["code"],
+                message=message)
+
+
+@api.post(API_IMPORT.path, summary=API_IMPORT.name)
+async def import_account(
+    actor=Security(get_actor_info, scopes=[API_IMPORT.scope]),
+    file: UploadFile = File(description="导入文件,CSV需包含表头(account,nickname,phone,account_status,password_enc),JSONL每行一个账号"),
+    file_format: OptImportFormat = Form(default=None, description="文件格式,为空时按文件扩展名判断")
+) -> Rsp:
+    if file_format is None:
+        suffix = (file.filename or "").rsplit(".", 1)[-1].lower()
+        if suffix not in OptImportFormat._value2member_map_:
+            return Rsp(**APIErr.IMPORT_FORMAT_ERROR)
+        file_format = OptImportFormat(suffix)
+
+    result = dict(total=0, created=0, errors=[])
+    try:
+        rows = iter_import_rows(file.file, file_format)
+        last_line = 0
+
+        # 按批次读取数据,每批次一次唯一性查询和一次多行插入,已提交的批次不会因后续批次失败而回滚,
+        # 批次失败时错误记录到该批次的行并继续导入,调用方可据此确定已创建的行
+        while True:
+            batch, read_err = await run_in_threadpool(read_import_batch, rows, settings.import_batch_size)
+            result["total"] += len(batch)
+            users, passwords, sources = [], [], []
+
+            for line_num, row in batch:
+                try:
+                    user, password = parse_import_row(row)
+                except ValidationError as e:
+                    detail = ";".join(f"{'.'.join(map(str, err['loc']))}:{err['msg']}" for err in e.errors())
+                    result["errors"].append(import_error(line_num, row, APIErr.ACCOUNT_INVALID, detail))
+                    continue
+                except Exception as e:
+                    result["errors"].append(import_error(line_num, row, APIErr.ACCOUNT_INVALID, f"{e}"))
+                    continue
+
+                users.append(user)
+                passwords.append(password)
+                sources.append((line_num, row))
+
+            pending = sources
+            try:
+                if users:
+                    # 先判断唯一性,只为通过判断的账号计算密码哈希,默认密码也逐个账号加盐
+                    failures = await run_query(actor.session, UserAPI.check_import_accounts, users)
+                    for idx, err in failures:
+                        result["errors"].append(import_error(*sources[idx], err))
+
+                    failed = {idx for idx, _ in failures}
+                    accepted = [idx for idx in range(len(users)) if idx not in failed]
+                    pending = [sources[idx] for idx in accepted]
+                    auth_values = await hash_pool.hash_many(
+                        [settings.default_passwd if passwords[idx] is None else passwords[idx] for idx in accepted])
+                    for idx, auth_value in zip(accepted, auth_values):
+                        users[idx]["auth_value"] = auth_value
+
+                    await run_query(actor.session, UserAPI.insert_accounts, [users[idx] for idx in accepted])
+                    result["created"] += len(accepted)
+            except Exception as e:
+                # 尚未创建任何账号时哈希执行器繁忙直接返回,调用方重试即可
+                if isinstance(e, HashPoolBusy) and not result["created"]:
+                    raise e
+                result["errors"].extend(
+                    import_error(*source, APIErr.IMPORT_BATCH_FAILED, f"{e}") for source in pending)
+
+            if batch:
+                last_line = batch[-1][0]
+            if read_err is not None:
+                result["errors"].append(import_error(last_line + 1, None, APIErr.IMPORT_READ_ERROR, f"{read_err}"))
+                break
+            if not batch:
+                break
+    except HashPoolBusy as e:
+        raise HTTPException(503, f"{e}")
+    except Exception as e:
+        raise HTTPException(500, f"{e}")
+    finally:
+        await file.close()
+
+    result["errors"].sort(key=lambda err: err["line"])
+    return Rsp(data=result)
+
+
 @api.post(API_UPDATE.path, summary=API_UPDATE.name)
-def update_account(
+async def update_account(
     actor=Security(get_actor_info, scopes=[API_UPDATE.scope]),
     req_data: AccountUpdate = Body()
 ) -> Rsp:
     try:
-        result = UserAPI.update_account(
-            actor.session, req_data.user_uuid, req_data.nickname, req_data.account_status)
+        result = await run_query(
+            actor.session, UserAPI.update_account, req_data.user_uuid, req_data.nickname, req_data.account_status)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(**result)
 
 
 @api.post(API_DELETE.path, summary=API_DELETE.name)
-def delete_account(
+async def delete_account(
     actor=Security(get_actor_info, scopes=[API_UPDATE.scope]),
     req_data: AccountDelete = Body()
 ) -> Rsp:
     try:
-        result = UserAPI.delete_account(actor.session, req_data.user_uuid)
+        result = await run_query(actor.session, UserAPI.delete_account, req_data.user_uuid)
+    except Exception as e:
+        raise HTTPException(500, f"{e}")
+    return Rsp(**result)
+
+
+@api.post(API_BATCH_UPDATE.path, summary=API_BATCH_UPDATE.name)
+async def batch_update_account(
+    actor=Security(get_actor_info, scopes=[API_BATCH_UPDATE.scope]),
+    req_data: AccountBatchUpdate = Body()
+) -> Rsp:
+    # 同一账号只保留最后一次的修改
+    accounts = {item.user_uuid: dict(user_uuid=item.user_uuid,
+                                     nickname=item.nickname,
+                                     account_status=item.account_status.value) for item in req_data.accounts}
+    try:
+        result = await run_query(actor.session, UserAPI.batch_update_account, list(accounts.values()))
+    except Exception as e:
+        raise HTTPException(500, f"{e}")
+    return Rsp(**result)
+
+
+@api.post(API_BATCH_DELETE.path, summary=API_BATCH_DELETE.name)
+async def batch_delete_account(
+    actor=Security(get_actor_info, scopes=[API_BATCH_DELETE.scope]),
+    req_data: AccountBatchDelete = Body()
+) -> Rsp:
+    try:
+        result = await run_query(actor.session, UserAPI.batch_delete_account, list(dict.fromkeys(req_data.user_uuids)))
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(**result)
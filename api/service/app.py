@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, Security, Depends, Query, Body
-from api.deps import Permission, Rsp, get_actor_info, get_page_info
-from api.model.app import App
+from pydantic import BaseModel, Field
+from api.deps import Permission, Rsp, Page, get_actor_info, get_page_info, run_query
+from api.model.app import App, AppService
 from api.model.permission import AppRole
+from api.model.role import Role, OptRoleStatus
 from api.schema.app import AppAPI
 
 api = APIRouter(prefix="/app")
@@ -15,65 +17,99 @@ permission = [
 ]
 
 
+class AppDetail(BaseModel):
+    app_name: str = Field(description=App.app_name.comment)
+    app_desc: str = Field(description=App.app_desc.comment)
+    created_at: str = Field(description=App.created_at.comment)
+    updated_at: str = Field(description=App.updated_at.comment)
+
+
+# 字段顺序与查询字段一致,返回JSON的键顺序不变
+class AppItem(BaseModel):
+    id: int = Field(description=App.id.comment)
+    app_uuid: str = Field(description=App.app_uuid.comment)
+    app_name: str = Field(description=App.app_name.comment)
+    app_desc: str = Field(description=App.app_desc.comment)
+    created_at: str = Field(description=App.created_at.comment)
+    updated_at: str = Field(description=App.updated_at.comment)
+
+
+class AppServiceItem(BaseModel):
+    service_identify: str = Field(description=AppService.service_identify.comment)
+    service_name: str = Field(description=AppService.service_name.comment)
+    is_enable: bool = Field(description=AppService.is_enable.comment)
+
+
+class AppRoleItem(BaseModel):
+    role_id: int = Field(description=AppRole.role_id.comment)
+    role_name: str = Field(description=Role.role_name.comment)
+    role_status: OptRoleStatus = Field(description=Role.role_status.comment)
+
+
+class AppRolePermissionItem(BaseModel):
+    service_identify: str = Field(description=AppService.service_identify.comment)
+    service_name: str = Field(description=AppService.service_name.comment)
+
+
 @api.get(API_LIST.path, summary=API_LIST.name)
-def get_app_list(
+async def get_app_list(
     actor=Security(get_actor_info, scopes=[API_LIST.scope]),
     pagination=Depends(get_page_info),
     app_name: str = Query(default=None, description=App.app_name.comment)
-) -> Rsp:
+) -> Rsp[Page[AppItem]]:
     try:
-        data = AppAPI.get_app_list(actor.session, pagination, app_name)
+        data = await run_query(actor.session, AppAPI.get_app_list, pagination, app_name)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
 @api.get(API_DETAIL.path, summary=API_DETAIL.name)
-def get_app_detail(
+async def get_app_detail(
     actor=Security(get_actor_info, scopes=[API_DETAIL.scope]),
     app_uuid: str = Query(description=App.app_uuid.comment)
-) -> Rsp:
+) -> Rsp[AppDetail]:
     try:
-        data = AppAPI.get_app_detail(actor.session, app_uuid)
+        data = await run_query(actor.session, AppAPI.get_app_detail, app_uuid)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
 @api.get(API_SERIVCE.path, summary=API_SERIVCE.name)
-def get_app_service(
+async def get_app_service(
     actor=Security(get_actor_info, scopes=[API_SERIVCE.scope]),
     app_uuid: str = Query(description=App.app_uuid.comment)
-) -> Rsp:
+) -> Rsp[list[AppServiceItem]]:
     try:
-        data = AppAPI.get_app_service(actor.session, app_uuid)
+        data = await run_query(actor.session, AppAPI.get_app_service, app_uuid)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
 @api.get(API_ROLE_LIST.path, summary=API_ROLE_LIST.name)
-def get_app_role_list(
+async def get_app_role_list(
     actor=Security(get_actor_info, scopes=[API_ROLE_LIST.scope]),
     app_id: int = Query(description=AppRole.app_id.comment)
-) -> Rsp:
+) -> Rsp[list[AppRoleItem]]:
     try:
-        data = AppAPI.get_app_role_list(actor.session, app_id)
+        data = await run_query(actor.session, AppAPI.get_app_role_list, app_id)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
 @api.get(API_ROLE_PERMISSION.path, summary=API_ROLE_PERMISSION.name)
-def get_app_role_permission(
+async def get_app_role_permission(
     actor=Security(get_actor_info, scopes=[API_ROLE_PERMISSION.scope]),
     pagination=Depends(get_page_info),
     app_id: int = Query(description=AppRole.app_id.comment),
     role_id: int = Query(description=AppRole.role_id.comment)
-) -> Rsp:
+) -> Rsp[Page[AppRolePermissionItem]]:
     try:
-        data = AppAPI.get_app_role_permission(
-            actor.session, pagination, app_id, role_id)
+        data = await run_query(
+            actor.session, AppAPI.get_app_role_permission, pagination, app_id, role_id)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
@@ -4,13 +4,14 @@ from fastapi import APIRouter, HTTPException, Depends, Body
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from api.config import settings
-from api.deps import Rsp, JwtPayload, get_db_session
+from api.deps import Rsp, JwtPayload, get_db_session, run_query, scope_registry
 from api.errcode import APIErr
-from api.security import client_aes_api, hash_api, jwt_api
+from api.metrics import LOGIN_TOTAL
+from api.security import HashPoolBusy, client_aes_api, hash_pool, jwt_api
 from api.model.user import User, UserAuth, OptAccountStatus
-from api.model.org import Org, OrgUser, OptOrgUserStatus
+from api.model.org import OptOrgUserStatus
 from api.schema.user import UserAPI
-from api.schema.org import OrgAPI
+from api.schema.permission import PermissionAPI
 
 
 api = APIRouter(prefix="/auth")
@@ -27,14 +28,14 @@ def check_org_owner(target, src) -> bool:
     return target == src
 
 
-def password_login(session: Session, account: str, password: str, org_uuid: str = None) -> Rsp:
-    r"""通过密码完成认证
+async def issue_token(session: Session, login_info: dict, org_uuid: str = None, scope_bitmap: bool = None) -> Rsp:
+    r"""为通过认证的用户签发token,组织信息来自登录查询结果,仅在需要权限位图且缓存未命中时查询数据库
 
     Parameters:
         session:数据库会话
-        account:账号
-        password:密码
+        login_info:登录信息(UserAPI.get_login_info的返回值)
         org_uuid:指定登录的组织UUID
+        scope_bitmap:token中是否携带权限位图,默认使用配置jwt_scope_bitmap
 
     Returns:
         Rsp{
@@ -43,60 +44,88 @@ def password_login(session: Session, account: str, password: str, org_uuid: str
             data:jwt的token字符
         }
     """
-    # 获取账号认证信息
-    account_auth = UserAPI.get_account_auth_info(session, account)
-
-    # 无数据或密码对不上
-    if not account_auth or not hash_api.verify(password, account_auth["auth_value"]):
-        return Rsp(**APIErr.WRONG_ACCOUNT_PASSWD)
-
-    # 如果账号状态不可用
-    if OptAccountStatus.DISABLE.value == account_auth["account_status"]:
-        return Rsp(**APIErr.ACCOUNT_STATUS_DISABLE)
-
-    user_uuid = account_auth["user_uuid"]
+    user_uuid = login_info["user_uuid"]
+    user_org_list = login_info["orgs"]
     is_org_owner = False
 
     if org_uuid:
         # 如果指定了登录的组织UUID
-        select_fields = [OrgUser.org_user_status, Org.org_owner_uuid]
-        org_user = OrgAPI.get_org_user_detail(
-            session, org_uuid, user_uuid, select_fields)
-        if not org_user:
+        if not user_org_list:
             # 组织下无该用户
             return Rsp(**APIErr.WRONG_ACCOUNT_PASSWD)
+        org_user = user_org_list[0]
         if OptOrgUserStatus.DISABLE.value == org_user["org_user_status"]:
             # 组织下该用户账号被停用
             return Rsp(**APIErr.ORG_USER_STATUS_DISABLE)
         is_org_owner = check_org_owner(org_user["org_owner_uuid"], user_uuid)
-    else:
-        select_fields = [Org.org_uuid,
-                         OrgUser.org_user_status, Org.org_owner_uuid]
-        user_org_list = UserAPI.get_user_org_list(
-            session, user_uuid, select_fields)
-
-        if len(user_org_list) == 1 and OptOrgUserStatus.ENABLE.value == user_org_list[0]["org_user_status"]:
-            # 仅有一个组织,且账户未被组织停用
-            org_uuid = user_org_list[0]["org_uuid"]
-            is_org_owner = check_org_owner(
-                user_uuid, user_org_list[0]["org_owner_uuid"])
+    elif len(user_org_list) == 1 and OptOrgUserStatus.ENABLE.value == user_org_list[0]["org_user_status"]:
+        # 仅有一个组织,且账户未被组织停用
+        org_uuid = user_org_list[0]["org_uuid"]
+        is_org_owner = check_org_owner(
+            user_uuid, user_org_list[0]["org_owner_uuid"])
 
     payload = JwtPayload(user_uuid=user_uuid,
                          org_uuid=org_uuid,
                          is_org_owner=is_org_owner)
+
+    if scope_bitmap is None:
+        scope_bitmap = settings.jwt_scope_bitmap
+
+    # 组织Owner无需鉴权,不需要携带权限位图
+    if scope_bitmap and org_uuid and not is_org_owner:
+        if (scopes := PermissionAPI.get_cached_scopes(org_uuid, user_uuid)) is None:
+            scopes = await run_query(session, PermissionAPI.get_actor_scopes, org_uuid, user_uuid)
+        payload.scope_version = scope_registry.version
+        payload.scope_bitmap = scope_registry.encode(scopes)
+
     data = jwt_api.encode(**asdict(payload))
     return Rsp(data=data)
 
 
+async def password_login(session: Session, account: str, password: str, org_uuid: str = None, scope_bitmap: bool = None) -> Rsp:
+    r"""通过密码完成认证,账号认证信息和所属组织一次查询获取,密码校验在哈希执行器中完成,不占用请求线程和事件循环
+
+    Parameters:
+        session:数据库会话
+        account:账号
+        password:密码
+        org_uuid:指定登录的组织UUID
+        scope_bitmap:token中是否携带权限位图,默认使用配置jwt_scope_bitmap
+
+    Returns:
+        Rsp{
+            code: 业务返回码
+            message: 业务返回信息
+            data:jwt的token字符
+        }
+    """
+    # 获取账号认证信息及所属组织
+    login_info = await run_query(session, UserAPI.get_login_info, account, org_uuid)
+
+    # 无数据或密码对不上
+    if not login_info or not await hash_pool.verify(password, login_info["auth_value"]):
+        rsp = Rsp(**APIErr.WRONG_ACCOUNT_PASSWD)
+    # 如果账号状态不可用
+    elif OptAccountStatus.DISABLE.value == login_info["account_status"]:
+        rsp = Rsp(**APIErr.ACCOUNT_STATUS_DISABLE)
+    else:
+        rsp = await issue_token(session, login_info, org_uuid, scope_bitmap)
+
+    LOGIN_TOTAL.labels(str(rsp.code)).inc()
+    return rsp
+
+
 @api.post("/login", summary="登录")
-def login(
+async def login(
     session=Depends(get_db_session),
     req_data: PasswordLogin = Body()
 ) -> Rsp:
     try:
         # 客户端过来的是加密的密码,需要先解密
         password = client_aes_api.decrypt(req_data.password_enc)
-        rsp = password_login(session, req_data.account, password)
+        rsp = await password_login(session, req_data.account, password)
+    except HashPoolBusy as e:
+        raise HTTPException(503, f"{e}")
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return rsp
@@ -112,7 +141,9 @@ async def docs_login(
         return {}
 
     try:
-        rsp = password_login(session, req_data.username, req_data.password)
+        rsp = await password_login(session, req_data.username, req_data.password)
+    except HashPoolBusy as e:
+        raise HTTPException(503, f"{e}")
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return {"access_token": rsp.data, "token_type": "bearer"}
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends, Security, Query, Body
 from pydantic import BaseModel, Field
-from api.deps import Rsp, Permission, Pagination, get_actor_info, get_page_info
-from api.model.org import Org, OptOrgStatus
+from starlette.responses import StreamingResponse
+from api.deps import Rsp, Page, Permission, Pagination, OptCountStrategy, OptExportFormat, get_actor_info, get_page_info, run_query
+from api.export import export_response
+from api.model.org import Org, OrgUser, OrgMember, OptOrgStatus, OptOrgUserStatus
 from api.model.user import User, OptAccountStatus
-from api.schema.org import OrgAPI
+from api.schema.org import OrgAPI, org_user_list_stmt
 from api.schema.user import UserAPI
 
 api = APIRouter(prefix="/org")
@@ -14,6 +16,7 @@ permission = [
     API_USER_LIST := Permission(path="/user_list", name="获取组织用户列表信息", scope="org:user_list"),
     API_OWNER_LIST := Permission(path="/owner_list", name="获取可成为组织Owner的用户列表", scope="org:owner_list"),
     API_CREATE := Permission(path="/create", name="创建组织", scope="org:create"),
+    API_USER_EXPORT := Permission(path="/user_export", name="导出组织用户", scope="org:user_export"),
 ]
 
 
@@ -26,56 +29,113 @@ class OrgCreate(BaseModel):
                                      default=OptOrgStatus.ENABLE)
 
 
+class OrgDetail(BaseModel):
+    org_uuid: str = Field(description=Org.org_uuid.comment)
+    org_name: str = Field(description=Org.org_name.comment)
+    org_status: OptOrgStatus = Field(description=Org.org_status.comment)
+    member_total: int = Field(description=Org.member_total.comment)
+    member_enable: int = Field(description=Org.member_enable.comment)
+    member_disable: int = Field(description=Org.member_disable.comment)
+    role_total: int = Field(description=Org.role_total.comment)
+    created_at: str = Field(description=Org.created_at.comment)
+    updated_at: str = Field(description=Org.updated_at.comment)
+    nickname: str = Field(description="组织Owner昵称")
+
+
+# 字段顺序与查询字段一致,返回JSON的键顺序不变
+class OrgItem(BaseModel):
+    org_uuid: str = Field(description=Org.org_uuid.comment)
+    org_name: str = Field(description=Org.org_name.comment)
+    org_owner_uuid: str = Field(description=Org.org_owner_uuid.comment)
+    org_status: OptOrgStatus = Field(description=Org.org_status.comment)
+    member_total: int = Field(description=Org.member_total.comment)
+    member_enable: int = Field(description=Org.member_enable.comment)
+    member_disable: int = Field(description=Org.member_disable.comment)
+    role_total: int = Field(description=Org.role_total.comment)
+    created_at: str = Field(description=Org.created_at.comment)
+    updated_at: str = Field(description=Org.updated_at.comment)
+    nickname: str = Field(description="组织Owner昵称")
+
+
+class OrgUserItem(BaseModel):
+    org_user_nickname: str = Field(description=OrgUser.org_user_nickname.comment)
+    org_user_status: OptOrgUserStatus = Field(description=OrgUser.org_user_status.comment)
+    account: str = Field(description=User.account.comment)
+    account_status: OptAccountStatus = Field(description=User.account_status.comment)
+
+
+class OrgOwnerItem(BaseModel):
+    user_uuid: str = Field(description=User.user_uuid.comment)
+    account: str = Field(description=User.account.comment)
+    nickname: str = Field(description=User.nickname.comment)
+
+
 @api.get(API_LIST.path, summary=API_LIST.name)
-def get_org_list(
+async def get_org_list(
     actor=Security(get_actor_info, scopes=[API_LIST.scope]),
     pagination=Depends(get_page_info),
     org_name: str = Query(default=None, description=Org.org_name.comment),
     org_status: OptOrgStatus = Query(
         default=None, description=Org.org_status.comment)
-) -> Rsp:
+) -> Rsp[Page[OrgItem]]:
     try:
-        data = OrgAPI.get_org_list(
-            actor.session, pagination, org_name, org_status)
+        data = await run_query(
+            actor.session, OrgAPI.get_org_list, pagination, org_name, org_status)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
 @api.get(API_DETAIL.path, summary=API_DETAIL.name)
-def get_org_detail(
+async def get_org_detail(
     actor=Security(get_actor_info, scopes=[API_DETAIL.scope]),
     org_uuid: str = Query(description=Org.org_uuid.comment)
-) -> Rsp:
+) -> Rsp[OrgDetail]:
     try:
-        data = OrgAPI.get_org_detail(actor.session, org_uuid)
+        data = await run_query(actor.session, OrgAPI.get_org_detail, org_uuid)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
 @api.get(API_USER_LIST.path, summary=API_USER_LIST.name)
-def get_user_list(
+async def get_user_list(
     actor=Security(get_actor_info, scopes=[API_USER_LIST.scope]),
     pagination=Depends(get_page_info),
     org_uuid: str = Query(description=Org.org_uuid.comment)
-) -> Rsp:
+) -> Rsp[Page[OrgUserItem]]:
     try:
-        data = OrgAPI.get_org_user_list(actor.session, pagination, org_uuid)
+        data = await run_query(actor.session, OrgAPI.get_org_user_list, pagination, org_uuid)
     except Exception as e:
         raise HTTPException(500, f"{e}")
     return Rsp(data=data)
 
 
+@api.get(API_USER_EXPORT.path, summary=API_USER_EXPORT.name)
+async def export_user(
+    actor=Security(get_actor_info, scopes=[API_USER_EXPORT.scope]),
+    export_format: OptExportFormat = Query(default=OptExportFormat.NDJSON, description="导出格式"),
+    org_uuid: str = Query(description=Org.org_uuid.comment)
+) -> StreamingResponse:
+    try:
+        stmt = org_user_list_stmt(org_uuid).order_by(
+            OrgMember.created_at.desc(), OrgMember.id.desc())
+        rsp = export_response(stmt, export_format, "org_user")
+    except Exception as e:
+        raise HTTPException(500, f"{e}")
+    return rsp
+
+
 @api.get(API_OWNER_LIST.path, summary=API_OWNER_LIST.name)
-def get_org_owner_list(
+async def get_org_owner_list(
     actor=Security(get_actor_info, scopes=[API_OWNER_LIST.scope]),
     account: str = Query(default="", description=User.account.comment)
-) -> Rsp:
+) -> Rsp[Page[OrgOwnerItem]]:
     try:
-        pagination = Pagination(page_idx=1, page_size=10)
-        data = UserAPI.get_account_list(
-            actor.session, pagination,
+        pagination = Pagination(page_idx=1, page_size=10,
+                                count_strategy=OptCountStrategy.NONE)
+        data = await run_query(
+            actor.session, UserAPI.get_account_list, pagination,
             account=account,
             account_status=OptAccountStatus.ENABLE,
             select_fields=[User.account, User.nickname, User.user_uuid]
@@ -86,7 +146,7 @@ def get_org_owner_list(
 
 
 @api.post(API_CREATE.path, summary=API_CREATE.name)
-def create_org(
+async def create_org(
     actor=Security(get_actor_info, scopes=[API_CREATE.scope]),
     req_data: OrgCreate = Body()
 ) -> Rsp:
@@ -94,7 +154,7 @@ def create_org(
         org = Org(org_name=req_data.org_name,
                   org_owner_uuid=req_data.org_owner_uuid,
                   org_status=req_data.org_status)
-        result = OrgAPI.create_org(actor.session, org)
+        result = await run_query(actor.session, OrgAPI.create_org, org)
     except Exception as e:
         raise HTTPException(500, f"{e}")
 
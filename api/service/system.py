@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Security
+from api.deps import Permission, Rsp, get_actor_info, engine, async_engine
+from api.pool import pool_status, threadpool_status
+
+api = APIRouter(prefix="/system")
+
+permission = [
+    API_POOL_STATS := Permission(path="/pool_stats", name="获取连接池及线程池状态", scope="system:pool_stats"),
+]
+
+
+@api.get(API_POOL_STATS.path, summary=API_POOL_STATS.name)
+async def get_pool_stats(
+    actor=Security(get_actor_info, scopes=[API_POOL_STATS.scope])
+) -> Rsp:
+    try:
+        data = dict(db=pool_status(engine),
+                    async_db=pool_status(async_engine),
+                    threadpool=threadpool_status())
+    except Exception as e:
+        raise HTTPException(500, f"{e}")
+    return Rsp(data=data)
@@ -0,0 +1,325 @@
+#! /usr/bin/env python3
+"""基准测试,数据库连接使用配置中的DB_URL
+
+search:对比账号/昵称模糊搜索在使用pg_trgm索引和顺序扫描下的耗时
+suite:数据查询函数及安全相关函数的基准测试,可保存基准结果并与之对比,存在性能退化时返回非0
+serialize:账号列表(/account/list)整页数据在不同返回方式下的序列化耗时
+
+    DB_URL=postgresql://... python benchmark_script.py search --seed 1000000
+    DB_URL=postgresql://... python benchmark_script.py search --rounds 20
+    DB_URL=postgresql://... python benchmark_script.py suite --save baseline.json
+    DB_URL=postgresql://... python benchmark_script.py suite --compare baseline.json --threshold 0.2
+    DB_URL=postgresql://... python benchmark_script.py serialize --rows 1000
+
+suite需要先通过model_script.py generate生成测试数据
+"""
+import json
+import sys
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass, field
+from datetime import datetime
+from statistics import mean, median, quantiles
+from time import perf_counter
+from typing import Any, Callable
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select, func, text
+from sqlalchemy.orm import sessionmaker, Session
+
+from api.config import settings
+from api.deps import Pagination, OptCountStrategy, Rsp, Page, FastJSONResponse
+from api.model.app import App
+from api.model.org import Org, OrgUser
+from api.model.role import Role
+from api.model.user import User
+from api.schema.base import ilike_contains
+from api.schema.app import AppAPI
+from api.schema.org import OrgAPI, check_org_unique
+from api.schema.permission import PermissionAPI
+from api.schema.role import RoleAPI, check_role_unique
+from api.schema.user import UserAPI, check_account_unique, check_superadmin_account
+from api.service.account import AccountItem
+from api.security import hash_api, jwt_api, server_aes_api, phone_cipher, create_uuid
+from model_script import count_prefix, generate_users
+
+
+def seed_users(session: Session, total: int):
+    """生成测试账号(bench_前缀)至指定数量,已存在的数量计入总数"""
+    exists = count_prefix(session, User.account, "bench_")
+    if total > exists:
+        generate_users(session, total - exists, prefix="bench_", phone_prefix="198")
+
+
+def plan_nodes(plan: dict) -> list[str]:
+    """获取执行计划中的扫描节点"""
+    nodes = []
+    if "Scan" in plan["Node Type"]:
+        nodes.append(f'{plan["Node Type"]}({plan.get("Index Name", plan.get("Relation Name"))})')
+    for sub_plan in plan.get("Plans", []):
+        nodes.extend(plan_nodes(sub_plan))
+    return nodes
+
+
+def bench(session: Session, rounds: int, account: str = None, nickname: str = None) -> dict:
+    """执行账号列表查询,返回耗时统计(毫秒)"""
+    pagination = Pagination(page_size=20, count_strategy=OptCountStrategy.EXACT)
+    costs = []
+    for _ in range(rounds):
+        start = perf_counter()
+        UserAPI.get_account_list(session, pagination, account, nickname)
+        costs.append((perf_counter() - start) * 1000)
+
+    column, value = (User.account, account) if account else (User.nickname, nickname)
+    stmt = select(User.id).where(User.is_deleted == False, ilike_contains(column, value))
+    compiled = stmt.compile(dialect=session.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    plan = session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+
+    return dict(mean=mean(costs),
+                p95=quantiles(costs, n=20)[-1] if len(costs) > 1 else costs[0],
+                plan=",".join(plan_nodes(plan[0]["Plan"])))
+
+
+def run_search(session: Session, rounds: int):
+    users = session.scalar(select(func.count()).select_from(User))
+    print(f"账号总数:{users}")
+
+    cases = [
+        ("账号", dict(account="bench_0012")),
+        ("账号(无结果)", dict(account="not_exists")),
+        ("昵称", dict(nickname="张伟")),
+    ]
+
+    for title, kw in cases:
+        for mode in ("index", "seqscan"):
+            if mode == "seqscan":
+                # 禁用索引扫描,模拟没有trgm索引的情况
+                session.execute(text("SET LOCAL enable_bitmapscan = off"))
+                session.execute(text("SET LOCAL enable_indexscan = off"))
+            result = bench(session, rounds, **kw)
+            session.rollback()
+            print(f"{title:<12}{mode:<8}mean={result['mean']:.2f}ms p95={result['p95']:.2f}ms plan={result['plan']}")
+
+
+@dataclass
+class Case:
+    """基准测试用例,每轮执行number次fn,耗时取单次平均"""
+    name: str
+    fn: Callable
+    args: tuple = ()
+    kw: dict = field(default_factory=dict)
+    # 执行轮数,为None时使用命令行参数
+    rounds: int | None = None
+    number: int = 1
+
+    def run(self, rounds: int) -> dict:
+        costs = []
+        for _ in range(self.rounds or rounds):
+            start = perf_counter()
+            for _ in range(self.number):
+                self.fn(*self.args, **self.kw)
+            costs.append((perf_counter() - start) * 1000 / self.number)
+
+        return dict(rounds=len(costs),
+                    mean_ms=round(mean(costs), 4),
+                    p50_ms=round(median(costs), 4),
+                    p95_ms=round(quantiles(costs, n=20)[-1] if len(costs) > 1 else costs[0], 4),
+                    min_ms=round(min(costs), 4))
+
+
+def sample_data(session: Session) -> dict:
+    """选取测试数据:用户数最多的组织及其中的非Owner用户,首个应用及其角色"""
+    org_id = session.scalar(select(OrgUser.org_id).where(OrgUser.is_deleted == False).group_by(
+        OrgUser.org_id).order_by(func.count().desc()).limit(1))
+    if org_id is None:
+        raise SystemExit("没有测试数据,请先执行: python model_script.py generate")
+
+    org = session.execute(select(Org.org_uuid, Org.org_name, Org.org_owner_uuid).where(
+        Org.id == org_id)).one()
+    user = session.execute(select(User.user_uuid, User.account, User.phone_bidx).join(
+        OrgUser, OrgUser.user_id == User.id).where(
+        OrgUser.org_id == org_id, User.user_uuid != org.org_owner_uuid).limit(1)).one()
+    app = session.execute(select(App.id, App.app_uuid).where(
+        App.is_deleted == False).order_by(App.id).limit(1)).first()
+    role = session.execute(select(Role.id, Role.role_name).where(
+        Role.app_uuid == app.app_uuid).limit(1)).first() if app else None
+
+    return dict(org_uuid=org.org_uuid, org_name=org.org_name,
+                user_uuid=user.user_uuid, account=user.account, phone_bidx=user.phone_bidx,
+                app_id=app.id if app else 0, app_uuid=app.app_uuid if app else "",
+                role_id=role.id if role else 0, role_name=role.role_name if role else "")
+
+
+def suite_cases(session: Session, data: dict) -> list[Case]:
+    page = Pagination(page_size=20, count_strategy=OptCountStrategy.EXACT)
+    deep_page = Pagination(page_idx=100, page_size=20, count_strategy=OptCountStrategy.EXACT)
+    cursor = Pagination(page_size=20, cursor="")
+
+    token = jwt_api.encode(user_uuid=data["user_uuid"], org_uuid=data["org_uuid"], is_org_owner=False)
+    phone = "13812345678"
+    phone_enc = server_aes_api.phone_encrypt(phone)
+    hashed = hash_api.hash(settings.default_passwd)
+
+    return [
+        # 账号
+        Case("user.get_login_info", UserAPI.get_login_info, (session, data["account"])),
+        Case("user.get_account_auth_info", UserAPI.get_account_auth_info, (session, data["account"])),
+        Case("user.get_user_org_list", UserAPI.get_user_org_list, (session, data["user_uuid"])),
+        Case("user.get_account_list", UserAPI.get_account_list, (session, page)),
+        Case("user.get_account_list(deep_page)", UserAPI.get_account_list, (session, deep_page)),
+        Case("user.get_account_list(cursor)", UserAPI.get_account_list, (session, cursor)),
+        Case("user.get_account_list(account)", UserAPI.get_account_list, (session, page, data["account"][-4:])),
+        Case("user.get_account_list(nickname)", UserAPI.get_account_list, (session, page, None, "张伟")),
+        Case("user.get_account_list(phone)", UserAPI.get_account_list, (session, page), dict(phone="19900000001")),
+        Case("user.get_account_detail", UserAPI.get_account_detail, (session, data["user_uuid"])),
+        Case("user.check_account_unique", check_account_unique,
+             (session, data["user_uuid"], data["account"], data["phone_bidx"] or None, True)),
+        Case("user.check_superadmin_account", check_superadmin_account, (session, data["user_uuid"])),
+        # 组织
+        Case("org.get_org_list", OrgAPI.get_org_list, (session, page)),
+        Case("org.get_org_list(org_name)", OrgAPI.get_org_list, (session, page, data["org_name"][-4:])),
+        Case("org.get_org_detail", OrgAPI.get_org_detail, (session, data["org_uuid"])),
+        Case("org.get_org_user_list", OrgAPI.get_org_user_list, (session, page, data["org_uuid"])),
+        Case("org.get_org_user_list(cursor)", OrgAPI.get_org_user_list, (session, cursor, data["org_uuid"])),
+        Case("org.get_org_user_detail", OrgAPI.get_org_user_detail, (session, data["org_uuid"], data["user_uuid"])),
+        Case("org.check_org_unique", check_org_unique, (session, data["org_uuid"], data["org_name"], True)),
+        # 应用
+        Case("app.get_app_list", AppAPI.get_app_list, (session, page)),
+        Case("app.get_app_detail", AppAPI.get_app_detail, (session, data["app_uuid"])),
+        Case("app.get_app_service", AppAPI.get_app_service, (session, data["app_uuid"])),
+        Case("app.get_app_permission", AppAPI.get_app_permission, (session, page, data["app_id"])),
+        Case("app.get_app_role_list", AppAPI.get_app_role_list, (session, data["app_id"])),
+        Case("app.get_app_role_permission", AppAPI.get_app_role_permission,
+             (session, page, data["app_id"], data["role_id"])),
+        # 角色及权限
+        Case("role.get_role_list", RoleAPI.get_role_list, (session, page, data["app_id"])),
+        Case("role.get_role_detail", RoleAPI.get_role_detail, (session, data["role_id"], "")),
+        Case("role.check_role_unique", check_role_unique, (session, data["role_name"], "")),
+        Case("permission.get_user_scopes", PermissionAPI.get_user_scopes,
+             (session, data["org_uuid"], data["user_uuid"])),
+        # 安全
+        Case("security.jwt_encode", jwt_api.encode, kw=dict(user_uuid=data["user_uuid"], org_uuid=data["org_uuid"]),
+             number=100),
+        Case("security.jwt_decode", jwt_api.decode, (token,), number=100),
+        Case("security.hash_verify", hash_api.verify, (settings.default_passwd, hashed), rounds=5),
+        Case("security.phone_encrypt", server_aes_api.phone_encrypt, (phone,), number=100),
+        Case("security.phone_decrypt", server_aes_api.phone_decrypt, (phone_enc,), number=100),
+        Case("security.phone_decrypt_many(100)", phone_cipher.decrypt_many, ([phone_enc] * 100,)),
+        Case("security.create_uuid", create_uuid, number=1000),
+    ]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """与基准结果对比p50耗时,返回退化的用例名"""
+    regressions = []
+    print(f"{'用例':<40}{'基准p50':>12}{'当前p50':>12}{'变化':>10}")
+    for name, result in results.items():
+        if (base := baseline.get(name)) is None:
+            print(f"{name:<40}{'-':>12}{result['p50_ms']:>12.4f}{'新增':>10}")
+            continue
+
+        ratio = result["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0
+        flag = ""
+        if ratio > threshold:
+            regressions.append(name)
+            flag = " !"
+        print(f"{name:<40}{base['p50_ms']:>12.4f}{result['p50_ms']:>12.4f}{ratio:>+10.1%}{flag}")
+    return regressions
+
+
+def run_suite(session: Session, args: Namespace) -> int:
+    data = sample_data(session)
+    results = {}
+    for case in suite_cases(session, data):
+        if args.filter and args.filter not in case.name:
+            continue
+        results[case.name] = case.run(args.rounds)
+        session.rollback()
+        print(f"{case.name:<40}p50={results[case.name]['p50_ms']:.4f}ms p95={results[case.name]['p95_ms']:.4f}ms")
+
+    if args.save:
+        meta = dict(created_at=datetime.now().isoformat(timespec="seconds"),
+                    dialect=session.get_bind().dialect.name,
+                    users=session.scalar(select(func.count()).select_from(User)),
+                    rounds=args.rounds)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(dict(meta=meta, results=results), f, ensure_ascii=False, indent=2)
+        print(f"基准结果已保存至{args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        if regressions := compare(results, baseline, args.threshold):
+            print(f"性能退化(超过{args.threshold:.0%}):{','.join(regressions)}")
+            return 1
+    return 0
+
+
+def run_serialize(session: Session, args: Namespace):
+    pagination = Pagination(page_size=args.rows, count_strategy=OptCountStrategy.NONE)
+    rsp = Rsp(data=UserAPI.get_account_list(session, pagination))
+    rows = len(rsp.data["records"])
+    if not rows:
+        raise SystemExit("没有测试数据,请先执行: python model_script.py generate")
+
+    untyped = TypeAdapter(Rsp[Any])
+    typed = TypeAdapter(Rsp[Page[AccountItem]])
+    plain, fast = JSONResponse(None), FastJSONResponse(None)
+
+    cases = [
+        # 未声明数据结构:通用编码后使用标准库json序列化
+        Case("jsonable_encoder+json", lambda: plain.render(jsonable_encoder(rsp))),
+        Case("Rsp[Any]+json", lambda: plain.render(untyped.dump_python(untyped.validate_python(rsp), mode="json"))),
+        Case("Rsp[Any]+orjson", lambda: fast.render(untyped.dump_python(untyped.validate_python(rsp), mode="json"))),
+        # 声明数据结构:按模型校验后序列化
+        Case("Rsp[Page[AccountItem]]+json",
+             lambda: plain.render(typed.dump_python(typed.validate_python(rsp.model_dump()), mode="json"))),
+        Case("Rsp[Page[AccountItem]]+orjson",
+             lambda: fast.render(typed.dump_python(typed.validate_python(rsp.model_dump()), mode="json"))),
+        Case("Rsp[Page[AccountItem]].dump_json",
+             lambda: typed.dump_json(typed.validate_python(rsp.model_dump()))),
+    ]
+
+    print(f"每页{rows}条数据")
+    for case in cases:
+        result = case.run(args.rounds)
+        print(f"{case.name:<40}p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms")
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="基准测试")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="模糊搜索基准测试")
+    search.add_argument("--seed", type=int, default=0, help="生成测试账号至指定数量")
+    search.add_argument("--rounds", type=int, default=10, help="每个用例的执行次数")
+
+    suite = commands.add_parser("suite", help="数据查询及安全函数基准测试")
+    suite.add_argument("--rounds", type=int, default=20, help="每个用例的执行次数")
+    suite.add_argument("--filter", default="", help="只执行名称包含该字符串的用例")
+    suite.add_argument("--save", default="", help="保存基准结果的文件")
+    suite.add_argument("--compare", default="", help="对比的基准结果文件")
+    suite.add_argument("--threshold", type=float, default=0.2, help="p50耗时增加超过该比例视为退化")
+
+    serialize = commands.add_parser("serialize", help="列表数据序列化基准测试")
+    serialize.add_argument("--rows", type=int, default=1000, help="每页数据量")
+    serialize.add_argument("--rounds", type=int, default=50, help="每种方式的执行次数")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    engine = create_engine(url=settings.db_url)
+    localSession = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    with localSession() as session:
+        match args.command:
+            case "search":
+                if args.seed:
+                    seed_users(session, args.seed)
+                run_search(session, args.rounds)
+            case "suite":
+                sys.exit(run_suite(session, args))
+            case "serialize":
+                run_serialize(session, args)
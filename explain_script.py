@@ -0,0 +1,188 @@
+#! /usr/bin/env python3
+"""执行计划回归检查,数据库连接使用配置中的DB_URL
+
+执行基准测试(benchmark_script.py suite)中的数据查询用例,捕获其产生的所有查询语句,
+通过EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)获取实际执行计划,以下情况视为不通过(返回非0):
+    1.对大表(数据量不少于--large-table)的顺序扫描
+    2.语句总代价超过--max-cost
+    3.单个扫描节点读取的数据行(含被过滤的行)超过--max-rows
+    4.用例执行出错(如关联了不存在的字段)
+
+    DB_URL=postgresql://... python explain_script.py
+    DB_URL=postgresql://... python explain_script.py --filter org. --show-plan
+    DB_URL=postgresql://... python explain_script.py --allow org.get_org_list(org_name):t_org
+
+需要先通过model_script.py generate生成测试数据;非PostgreSQL数据库使用EXPLAIN QUERY PLAN,只检查顺序扫描
+"""
+import json
+import sys
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass, field
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy.orm import sessionmaker, Session
+
+from api.config import settings
+from api.model.base import ModelBase
+from benchmark_script import Case, sample_data, suite_cases
+
+
+# 不带筛选条件的列表精确统计总数时需要读取全部未删除数据,允许对应表的顺序扫描
+ALLOW_SEQSCAN = {
+    "user.get_account_list": {"t_user"},
+    "user.get_account_list(deep_page)": {"t_user"},
+    "org.get_org_list": {"t_org"},
+    "app.get_app_list": {"t_app"},
+}
+
+
+@dataclass
+class Statement:
+    """用例执行的查询语句及其执行计划检查结果"""
+    sql: str
+    params: tuple | dict
+    plan: list | None = None
+    nodes: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def table_rows(session: Session) -> dict[str, int]:
+    """获取各表的数据量"""
+    return {table.name: session.scalar(select(func.count()).select_from(table))
+            for table in ModelBase.metadata.sorted_tables}
+
+
+def capture(session: Session, case: Case) -> list[Statement]:
+    """执行用例并捕获查询语句"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, sql, params, context, executemany):
+        # 只检查查询语句,EXPLAIN(估算总数)及写入语句跳过
+        if sql.split(None, 1)[0].upper() in ("SELECT", "WITH"):
+            statements.append(Statement(sql, params))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        case.fn(*case.args, **case.kw)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        session.rollback()
+    return statements
+
+
+def walk(plan: dict):
+    """遍历执行计划节点"""
+    yield plan
+    for sub_plan in plan.get("Plans", []):
+        yield from walk(sub_plan)
+
+
+def check_pg(session: Session, stmt: Statement, rows: dict, allow: set, args: Namespace):
+    conn = session.connection()
+    stmt.plan = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {stmt.sql}", stmt.params).scalar()
+    session.rollback()
+
+    root = stmt.plan[0]["Plan"]
+    allowed = False
+    for node in walk(root):
+        if "Scan" not in node["Node Type"]:
+            continue
+
+        table = node.get("Relation Name", "")
+        stmt.nodes.append(f'{node["Node Type"]}({node.get("Index Name", table)})')
+        if table in allow:
+            allowed = True
+            continue
+
+        if node["Node Type"] == "Seq Scan" and rows.get(table, 0) >= args.large_table:
+            stmt.errors.append(f"顺序扫描大表{table}({rows[table]}行)")
+
+        loops = node.get("Actual Loops", 1)
+        scanned = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * loops
+        if scanned > args.max_rows:
+            stmt.errors.append(f"{node['Node Type']}({table})读取{scanned}行,超过{args.max_rows}")
+
+    if not allowed and root["Total Cost"] > args.max_cost:
+        stmt.errors.append(f"总代价{root['Total Cost']}超过{args.max_cost}")
+
+
+def check_generic(session: Session, stmt: Statement, rows: dict, allow: set, args: Namespace):
+    conn = session.connection()
+    stmt.plan = [tuple(row) for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {stmt.sql}", stmt.params)]
+    session.rollback()
+
+    for *_, detail in stmt.plan:
+        stmt.nodes.append(detail)
+        # SQLite:SCAN <表名>为全表扫描,SCAN <表名> USING [COVERING] INDEX为全索引扫描
+        words = detail.split()
+        if words[0] != "SCAN" or "USING" in words:
+            continue
+        table = words[1]
+        if table not in allow and rows.get(table, 0) >= args.large_table:
+            stmt.errors.append(f"顺序扫描大表{table}({rows[table]}行)")
+
+
+def parse_allow(items: list[str]) -> dict[str, set]:
+    allow = {name: set(tables) for name, tables in ALLOW_SEQSCAN.items()}
+    for item in items:
+        name, _, table = item.rpartition(":")
+        allow.setdefault(name, set()).add(table)
+    return allow
+
+
+def run(session: Session, args: Namespace) -> int:
+    rows = table_rows(session)
+    allow = parse_allow(args.allow)
+    check = check_pg if session.get_bind().dialect.name == "postgresql" else check_generic
+    failures = 0
+
+    for case in suite_cases(session, sample_data(session)):
+        if case.name.startswith("security.") or args.filter not in case.name:
+            continue
+
+        try:
+            statements = capture(session, case)
+            for stmt in statements:
+                check(session, stmt, rows, allow.get(case.name, set()), args)
+        except Exception as e:
+            session.rollback()
+            failures += 1
+            print(f"[ERROR] {case.name}: {e.__class__.__name__}: {str(e).splitlines()[0]}")
+            continue
+
+        errors = [error for stmt in statements for error in stmt.errors]
+        failures += bool(errors)
+        print(f"[{'FAIL' if errors else 'OK'}] {case.name} ({len(statements)}条语句)")
+        for stmt in statements:
+            if stmt.errors or args.show_plan:
+                print(f"    {' '.join(stmt.sql.split())}")
+                print(f"    {', '.join(stmt.nodes)}")
+            for error in stmt.errors:
+                print(f"    ! {error}")
+            if args.show_plan:
+                print(json.dumps(stmt.plan, ensure_ascii=False, indent=2))
+
+    print(f"共{failures}个用例不通过" if failures else "全部通过")
+    return 1 if failures else 0
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="执行计划回归检查")
+    parser.add_argument("--filter", default="", help="只检查名称包含该字符串的用例")
+    parser.add_argument("--large-table", type=int, default=10000, help="数据量不少于该值的表视为大表,不允许顺序扫描")
+    parser.add_argument("--max-cost", type=float, default=10000, help="单条语句的总代价上限")
+    parser.add_argument("--max-rows", type=int, default=10000, help="单个扫描节点读取的数据行上限")
+    parser.add_argument("--allow", action="append", default=[], metavar="CASE:TABLE",
+                        help="允许指定用例对该表顺序扫描且不检查代价,可重复指定")
+    parser.add_argument("--show-plan", action="store_true", help="输出所有语句及执行计划")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    engine = create_engine(url=settings.db_url)
+    localSession = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    with localSession() as session:
+        sys.exit(run(session, args))
@@ -0,0 +1,102 @@
+import os
+import tempfile
+from datetime import datetime
+
+# 测试使用独立的SQLite数据库,需在导入api之前设置
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ["DB_ASYNC"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import ColumnDefault, insert
+from sqlalchemy.orm import Session
+
+from api.main import app
+from api.deps import engine
+from api.model.base import ModelBase
+from api.model.user import User, UserAuth
+from api.model.org import Org, OrgUser
+from api.model.app import App, AppService
+from api.model.role import Role, OrgUserRole
+from api.model.permission import AppRole
+from api.schema.base import count_cache
+from api.schema.member import refresh_org_member
+from api.schema.permission import scope_cache
+from api.security import hash_api, client_aes_api
+
+# SQLite以字符串存储时间,func.now()只精确到秒,而DateTime绑定参数总会附带微秒,按字符串比较游标时同一秒的数据会错位,
+# 测试库的创建和更新时间改为Python端生成,与绑定参数的格式一致
+for table in ModelBase.metadata.tables.values():
+    ColumnDefault(datetime.now)._set_parent(table.c.created_at)
+    ColumnDefault(datetime.now)._set_parent(table.c.updated_at)
+    ColumnDefault(datetime.now, for_update=True)._set_parent(table.c.updated_at)
+
+PASSWORD = "qwe321"
+PASSWORD_HASH = hash_api.hash(PASSWORD)
+
+
+@pytest.fixture
+def db():
+    r"""重建数据库并初始化数据:
+    超级管理员owner(管理者组织org_1的Owner),组织用户member(角色r1授予应用app_1的account:list)
+    """
+    ModelBase.metadata.drop_all(engine)
+    ModelBase.metadata.create_all(engine)
+    scope_cache.clear()
+    count_cache.clear()
+
+    with Session(engine) as session:
+        session.add_all([
+            User(id=1, user_uuid="usr_owner", account="owner", nickname="Owner"),
+            User(id=2, user_uuid="usr_member", account="member", nickname="Member"),
+            UserAuth(user_id=1, auth_value=PASSWORD_HASH),
+            UserAuth(user_id=2, auth_value=PASSWORD_HASH),
+            Org(id=1, org_uuid="org_1", org_name="Org1", org_owner_uuid="usr_owner", is_admin=True),
+            OrgUser(org_id=1, user_id=1),
+            OrgUser(org_id=1, user_id=2),
+            App(id=1, app_uuid="app_1", app_name="UC"),
+            AppService(app_uuid="app_1", service_identify="account:list", service_name="获取账号列表信息"),
+            Role(id=1, role_name="r1", app_uuid="app_1"),
+            AppRole(app_id=1, role_id=1),
+            OrgUserRole(org_uuid="org_1", user_uuid="usr_member", role_id=1),
+        ])
+        session.flush()
+        refresh_org_member(session)
+        session.commit()
+        yield session
+
+
+@pytest.fixture
+def client(db) -> TestClient:
+    return TestClient(app)
+
+
+def login(client: TestClient, account: str, password: str = PASSWORD) -> dict:
+    r"""登录并返回请求头
+    """
+    rsp = client.post("/auth/login", json=dict(account=account, password_enc=client_aes_api.encrypt(password)))
+    assert rsp.status_code == 200, rsp.text
+    assert rsp.json()["code"] == 0, rsp.text
+    return {"Authorization": f"Bearer {rsp.json()['data']}"}
+
+
+@pytest.fixture
+def owner(client) -> dict:
+    return login(client, "owner")
+
+
+@pytest.fixture
+def member(client) -> dict:
+    return login(client, "member")
+
+
+def add_members(session: Session, total: int, org_id: int = 1, prefix: str = "usr_m") -> list[str]:
+    r"""批量添加账号并加入组织,返回账号UUID列表
+    """
+    user_ids = session.scalars(insert(User).returning(User.id, sort_by_parameter_order=True),
+                               [dict(user_uuid=f"{prefix}{idx}", account=f"{prefix}{idx}", nickname=f"n{idx}")
+                                for idx in range(total)]).all()
+    session.execute(insert(OrgUser), [dict(org_id=org_id, user_id=user_id) for user_id in user_ids])
+    refresh_org_member(session, org_ids=[org_id])
+    session.commit()
+    return [f"{prefix}{idx}" for idx in range(total)]
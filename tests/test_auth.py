@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from sqlalchemy import update
+from api.errcode import APIErr
+from api.model.user import User, UserAuth, OptAccountStatus
+from api.model.org import Org, OrgUser, OptOrgStatus, OptOrgUserStatus
+from api.security import client_aes_api, jwt_api
+from api.service.auth import password_login
+from tests.conftest import PASSWORD
+
+
+def login_rsp(client, account: str, password: str = PASSWORD) -> dict:
+    rsp = client.post("/auth/login", json=dict(account=account, password_enc=client_aes_api.encrypt(password)))
+    assert rsp.status_code == 200, rsp.text
+    return rsp.json()
+
+
+def token_payload(rsp: dict) -> dict:
+    assert rsp["code"] == APIErr.NO_ERROR["code"], rsp
+    return jwt_api.decode(rsp["data"])
+
+
+def login_org(db, account: str, org_uuid: str, password: str = PASSWORD):
+    r"""指定组织登录(登录接口未开放组织参数,直接调用认证函数)
+    """
+    return asyncio.run(password_login(db, account, password, org_uuid))
+
+
+@pytest.fixture
+def orgs(db):
+    r"""member另属于组织org_2(Owner)及org_3
+    """
+    db.add_all([
+        Org(id=2, org_uuid="org_2", org_name="Org2", org_owner_uuid="usr_member"),
+        Org(id=3, org_uuid="org_3", org_name="Org3", org_owner_uuid="usr_owner"),
+        OrgUser(org_id=2, user_id=2),
+        OrgUser(org_id=3, user_id=2),
+    ])
+    db.commit()
+
+
+def test_superadmin_login(client):
+    payload = token_payload(login_rsp(client, "owner"))
+    assert (payload["user_uuid"], payload["org_uuid"], payload["is_org_owner"]) == ("usr_owner", "org_1", True)
+
+
+def test_single_org_login(client):
+    payload = token_payload(login_rsp(client, "member"))
+    assert (payload["user_uuid"], payload["org_uuid"], payload["is_org_owner"]) == ("usr_member", "org_1", False)
+
+
+@pytest.mark.parametrize("account, password", [("member", "wrong"), ("nobody", PASSWORD)])
+def test_wrong_account_password(client, account, password):
+    assert login_rsp(client, account, password)["code"] == APIErr.WRONG_ACCOUNT_PASSWD["code"]
+
+
+def test_disabled_account(client, db):
+    db.execute(update(User).where(User.id == 2).values(account_status=OptAccountStatus.DISABLE.value))
+    db.commit()
+
+    assert login_rsp(client, "member")["code"] == APIErr.ACCOUNT_STATUS_DISABLE["code"]
+    # 密码错误时不暴露账号状态
+    assert login_rsp(client, "member", "wrong")["code"] == APIErr.WRONG_ACCOUNT_PASSWD["code"]
+
+
+@pytest.mark.parametrize("model", [User, UserAuth])
+def test_deleted_account(client, db, model):
+    db.execute(update(model).where((model.id if model is User else model.user_id) == 2).values(is_deleted=True))
+    db.commit()
+
+    assert login_rsp(client, "member")["code"] == APIErr.WRONG_ACCOUNT_PASSWD["code"]
+
+
+def test_multiple_orgs(client, db, orgs):
+    # 属于多个组织时不指定登录组织
+    payload = token_payload(login_rsp(client, "member"))
+    assert (payload["org_uuid"], payload["is_org_owner"]) == (None, False)
+
+    # 停用或删除的组织不计入所属组织
+    db.execute(update(Org).where(Org.id == 2).values(org_status=OptOrgStatus.DISABLE.value))
+    db.execute(update(Org).where(Org.id == 3).values(is_deleted=True))
+    db.commit()
+    assert token_payload(login_rsp(client, "member"))["org_uuid"] == "org_1"
+
+
+def test_org_user_disabled(client, db):
+    db.execute(update(OrgUser).where(OrgUser.user_id == 2).values(org_user_status=OptOrgUserStatus.DISABLE.value))
+    db.commit()
+
+    assert token_payload(login_rsp(client, "member"))["org_uuid"] is None
+
+
+def test_explicit_org(db, orgs):
+    # 属于多个组织时按指定的组织登录,是否为Owner按该组织判断
+    for org_uuid, is_org_owner in (("org_1", False), ("org_2", True), ("org_3", False)):
+        payload = token_payload(login_org(db, "member", org_uuid).model_dump())
+        assert (payload["org_uuid"], payload["is_org_owner"]) == (org_uuid, is_org_owner)
+
+    assert login_org(db, "member", "org_missing").code == APIErr.WRONG_ACCOUNT_PASSWD["code"]
+    assert login_org(db, "member", "org_2", "wrong").code == APIErr.WRONG_ACCOUNT_PASSWD["code"]
+
+    db.execute(update(OrgUser).where(OrgUser.org_id == 2).values(org_user_status=OptOrgUserStatus.DISABLE.value))
+    db.commit()
+    assert login_org(db, "member", "org_2").code == APIErr.ORG_USER_STATUS_DISABLE["code"]
@@ -0,0 +1,97 @@
+from sqlalchemy import select
+from api.config import settings
+from api.errcode import APIErr
+from api.model.user import User, UserAuth, OptAccountStatus
+from api.model.org import Org, OrgMember
+from tests.conftest import add_members
+
+
+def accounts(session, user_uuids: list[str]) -> dict[str, tuple]:
+    session.rollback()
+    rows = session.execute(select(User.user_uuid, User.account, User.nickname, User.account_status, User.is_deleted)
+                           .where(User.user_uuid.in_(user_uuids))).all()
+    return {user_uuid: tuple(values) for user_uuid, *values in rows}
+
+
+def member_status(session) -> dict[str, int]:
+    session.rollback()
+    return dict(session.execute(select(OrgMember.user_uuid, OrgMember.account_status)).all())
+
+
+def test_batch_update(client, db, owner):
+    uuids = add_members(db, 3)
+    disable = OptAccountStatus.DISABLE.value
+    rsp = client.post("/account/batch_update", headers=owner, json=dict(accounts=[
+        dict(user_uuid=uuids[0], nickname="first"),
+        dict(user_uuid=uuids[1], nickname="b", account_status=disable),
+        # 同一账号以最后一次修改为准
+        dict(user_uuid=uuids[0], nickname="last", account_status=disable),
+        dict(user_uuid="usr_missing", nickname="x"),
+    ]))
+
+    assert rsp.json() == dict(**APIErr.NO_ERROR, data=2)
+    result = accounts(db, uuids)
+    assert result[uuids[0]][1:3] == ("last", disable)
+    assert result[uuids[1]][1:3] == ("b", disable)
+    assert result[uuids[2]][1:3] == ("n2", OptAccountStatus.ENABLE.value)
+    # 读模型同步更新
+    status = member_status(db)
+    assert (status[uuids[0]], status[uuids[1]], status[uuids[2]]) == (disable, disable, 0)
+
+
+def test_batch_update_superadmin(client, db, owner):
+    uuids = add_members(db, 2)
+    before = accounts(db, [*uuids, "usr_owner"])
+    rsp = client.post("/account/batch_update", headers=owner, json=dict(accounts=[
+        dict(user_uuid=uuids[0], nickname="x"),
+        dict(user_uuid="usr_owner", nickname="x"),
+        dict(user_uuid=uuids[1], nickname="x"),
+    ]))
+
+    # 包含超级管理员时整批不修改
+    assert rsp.json() == dict(**APIErr.SUPERADMIN_PROTECT, data=["usr_owner"])
+    assert accounts(db, [*uuids, "usr_owner"]) == before
+
+
+def test_batch_delete(client, db, owner):
+    uuids = add_members(db, 3)
+    db.add_all([UserAuth(user_id=user_id) for user_id in db.scalars(select(User.id).where(User.user_uuid.in_(uuids)))])
+    db.commit()
+
+    rsp = client.post("/account/batch_delete", headers=owner, json=dict(user_uuids=[uuids[0], uuids[1], uuids[0]]))
+    assert rsp.json() == dict(**APIErr.NO_ERROR, data=2)
+
+    result = accounts(db, uuids)
+    # 删除的账号释放账号名
+    assert result[uuids[0]] == (uuids[0], "n0", 0, True)
+    assert result[uuids[2]][3] is False
+    assert db.scalars(select(UserAuth.is_deleted).join(User, User.id == UserAuth.user_id)
+                      .where(User.user_uuid.in_(uuids)).order_by(User.id)).all() == [True, True, False]
+    assert set(member_status(db)) == {"usr_owner", "usr_member", uuids[2]}
+    assert db.scalar(select(Org.member_total).where(Org.id == 1)) == 3
+
+    # 重复删除不计数
+    rsp = client.post("/account/batch_delete", headers=owner, json=dict(user_uuids=uuids[:2]))
+    assert rsp.json()["data"] == 0
+
+
+def test_batch_delete_superadmin(client, db, owner):
+    uuids = add_members(db, 2)
+    rsp = client.post("/account/batch_delete", headers=owner, json=dict(user_uuids=[*uuids, "usr_owner"]))
+
+    assert rsp.json() == dict(**APIErr.SUPERADMIN_PROTECT, data=["usr_owner"])
+    assert all(not values[3] for values in accounts(db, uuids).values())
+    assert db.scalar(select(Org.member_total).where(Org.id == 1)) == 4
+
+
+def test_batch_limit(client, owner):
+    assert client.post("/account/batch_delete", headers=owner, json=dict(user_uuids=[])).status_code == 422
+    assert client.post("/account/batch_update", headers=owner, json=dict(accounts=[])).status_code == 422
+    user_uuids = [f"usr_{idx}" for idx in range(settings.account_batch_limit + 1)]
+    assert client.post("/account/batch_delete", headers=owner, json=dict(user_uuids=user_uuids)).status_code == 422
+
+
+def test_batch_requires_scope(client, member):
+    assert client.post("/account/batch_delete", headers=member, json=dict(user_uuids=["usr_member"])).status_code == 403
+    assert client.post("/account/batch_update", headers=member,
+                       json=dict(accounts=[dict(user_uuid="usr_member", nickname="x")])).status_code == 403
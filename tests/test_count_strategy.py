@@ -0,0 +1,53 @@
+import pytest
+from api.config import settings
+from tests.conftest import add_members
+
+
+def account_page(client, headers: dict, **params) -> dict:
+    rsp = client.get("/account/list", headers=headers, params=dict(page_size=10, **params))
+    assert rsp.status_code == 200, rsp.text
+    return rsp.json()["data"]
+
+
+@pytest.mark.parametrize("strategy", ["exact", "cached", "estimate"])
+def test_count_strategy_total(client, db, owner, strategy):
+    add_members(db, 13)
+
+    data = account_page(client, owner, count_strategy=strategy)
+
+    assert data["pagination"]["count_strategy"] == strategy
+    # 非PostgreSQL时估算按精确统计
+    assert data["pagination"]["total"] == 15
+    assert data["pagination"]["page_total"] == 2
+    assert len(data["records"]) == 10
+
+
+def test_count_strategy_none(client, db, owner):
+    add_members(db, 3)
+
+    data = account_page(client, owner, count_strategy="none")
+
+    assert data["pagination"]["total"] is None
+    assert data["pagination"]["page_total"] is None
+    assert len(data["records"]) == 5
+
+
+def test_cached_count_reused_within_ttl(client, db, owner):
+    assert account_page(client, owner, count_strategy="cached")["pagination"]["total"] == 2
+    add_members(db, 3)
+
+    # 缓存有效期内复用统计结果,精确统计不受影响
+    assert account_page(client, owner, count_strategy="cached")["pagination"]["total"] == 2
+    assert account_page(client, owner, count_strategy="exact")["pagination"]["total"] == 5
+    # 查询条件不同时单独统计
+    assert account_page(client, owner, count_strategy="cached", account="usr_m")["pagination"]["total"] == 3
+
+
+def test_default_strategy_from_settings(client, owner, monkeypatch):
+    monkeypatch.setattr(settings, "page_count_strategy", "none")
+    assert account_page(client, owner)["pagination"]["count_strategy"] == "none"
+
+
+def test_exact_empty_result(client, owner):
+    data = account_page(client, owner, count_strategy="exact", account="nobody")
+    assert data["records"] == [] and data["pagination"]["total"] == 0
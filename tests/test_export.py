@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import pytest
+from sqlalchemy import update
+from api.config import settings
+from api.model.user import User
+from api.security import server_aes_api, phone_blind_index
+from tests.conftest import add_members
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    r"""每批次读取2条数据,验证跨批次输出
+    """
+    monkeypatch.setattr(settings, "export_batch_size", 2)
+
+
+def export(client, path: str, headers: dict, **params):
+    rsp = client.get(path, headers=headers, params=params)
+    assert rsp.status_code == 200, rsp.text
+    return rsp
+
+
+def read_ndjson(rsp) -> list[dict]:
+    return [json.loads(line) for line in rsp.text.splitlines()]
+
+
+def read_csv(rsp) -> tuple[list[str], list[dict]]:
+    assert rsp.content.startswith(b"\xef\xbb\xbf")
+    reader = csv.DictReader(io.StringIO(rsp.content.decode("utf-8-sig")))
+    return reader.fieldnames, list(reader)
+
+
+def test_account_export_ndjson(client, db, owner):
+    add_members(db, 5)
+    db.execute(update(User).where(User.user_uuid == "usr_member").values(
+        phone_enc=server_aes_api.phone_encrypt("13812345678"), phone_bidx=phone_blind_index("13812345678")))
+    db.commit()
+
+    rsp = export(client, "/account/export", owner)
+    records = read_ndjson(rsp)
+
+    assert rsp.headers["content-type"].startswith("application/x-ndjson")
+    assert 'filename="account.ndjson"' in rsp.headers["content-disposition"]
+    # 与列表接口的顺序和字段一致
+    listed = client.get("/account/list", headers=owner, params=dict(page_size=100)).json()["data"]["records"]
+    assert records == listed
+    assert next(record for record in records if record["user_uuid"] == "usr_member")["phone"] == "138****5678"
+
+
+def test_account_export_csv(client, db, owner):
+    add_members(db, 4)
+
+    rsp = export(client, "/account/export", owner, export_format="csv", account="usr_m")
+    fields, rows = read_csv(rsp)
+
+    assert 'filename="account.csv"' in rsp.headers["content-disposition"]
+    assert fields[:3] == ["user_uuid", "account", "nickname"]
+    assert sorted(row["user_uuid"] for row in rows) == [f"usr_m{idx}" for idx in range(4)]
+
+
+def test_export_empty(client, owner):
+    fields, rows = read_csv(export(client, "/account/export", owner, export_format="csv", account="nobody"))
+    assert fields and rows == []
+    assert export(client, "/account/export", owner, account="nobody").text == ""
+
+
+def test_org_user_export(client, db, owner):
+    add_members(db, 3)
+
+    records = read_ndjson(export(client, "/org/user_export", owner, org_uuid="org_1"))
+    _, rows = read_csv(export(client, "/org/user_export", owner, org_uuid="org_1", export_format="csv"))
+
+    assert len(records) == len(rows) == 5
+    assert [record["account"] for record in records] == [row["account"] for row in rows]
+    assert set(records[0]) == {"org_user_nickname", "org_user_status", "account", "account_status"}
+
+
+def test_export_requires_scope(client, member):
+    assert client.get("/account/export", headers=member).status_code == 403
@@ -0,0 +1,146 @@
+import json
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from api.config import settings
+from api.deps import engine
+from api.errcode import APIErr
+from api.model.user import User, UserAuth
+from api.schema.user import UserAPI
+from api.security import client_aes_api, hash_api
+from tests.conftest import login
+
+
+def import_file(client, headers: dict, filename: str, content: str, **form) -> dict:
+    rsp = client.post("/account/import", headers=headers, data=form,
+                      files=dict(file=(filename, content.encode("utf-8"), "application/octet-stream")))
+    assert rsp.status_code == 200, rsp.text
+    return rsp.json()
+
+
+@pytest.fixture(params=[1000, 2])
+def batch_size(request, monkeypatch):
+    r"""分别验证单批次和跨批次导入
+    """
+    monkeypatch.setattr(settings, "import_batch_size", request.param)
+    return request.param
+
+
+def test_import_csv_line_errors(client, owner, batch_size):
+    content = "\n".join([
+        "account,nickname,phone,account_status,password_enc",
+        "alice,Alice,13800000001,0,",
+        "1bad,Bad,,0,",
+        "member,Dup,,0,",
+        "bob,Bob,13800000001,0,",
+        "alice,Again,,0,",
+        "carol,,,0,",
+        "dave,Dave,,1,",
+    ])
+
+    data = import_file(client, owner, "accounts.csv", content)["data"]
+
+    assert data["total"] == 7
+    assert data["created"] == 2
+    errors = {error["line"]: (error["account"], error["code"]) for error in data["errors"]}
+    assert errors == {
+        3: ("1bad", APIErr.ACCOUNT_INVALID["code"]),
+        4: ("member", APIErr.ACCOUNT_EXISTSED["code"]),
+        5: ("bob", APIErr.PHONE_EXISTED["code"]),
+        6: ("alice", APIErr.ACCOUNT_EXISTSED["code"]),
+        7: ("carol", APIErr.ACCOUNT_INVALID["code"]),
+    }
+    assert [error["line"] for error in data["errors"]] == sorted(errors)
+
+
+def test_import_jsonl_custom_password(client, owner):
+    content = "\n".join([
+        json.dumps(dict(account="alice", nickname="Alice", password_enc=client_aes_api.encrypt("secret1"))),
+        "not json",
+        "",
+        json.dumps(["not", "an", "object"]),
+        json.dumps(dict(account="bob", nickname="Bob")),
+    ])
+
+    data = import_file(client, owner, "accounts.jsonl", content)["data"]
+
+    assert (data["total"], data["created"]) == (4, 2)
+    assert [(error["line"], error["code"]) for error in data["errors"]] == [
+        (2, APIErr.ACCOUNT_INVALID["code"]), (4, APIErr.ACCOUNT_INVALID["code"])]
+    # 自定义密码及默认密码均可登录
+    login(client, "alice", "secret1")
+    login(client, "bob")
+
+
+def test_import_format(client, owner):
+    assert import_file(client, owner, "accounts.txt", "x")["code"] == APIErr.IMPORT_FORMAT_ERROR["code"]
+
+    content = json.dumps(dict(account="alice", nickname="Alice"))
+    data = import_file(client, owner, "accounts.txt", content, file_format="jsonl")["data"]
+    assert data["created"] == 1
+
+
+def test_import_requires_scope(client, member):
+    rsp = client.post("/account/import", headers=member, files=dict(file=("a.csv", b"account,nickname\n")))
+    assert rsp.status_code == 403
+
+
+def test_reimport_skips_hashing(client, db, owner, monkeypatch):
+    content = "\n".join(["account,nickname,password_enc", "alice,Alice,", f"bob,Bob,{client_aes_api.encrypt('secret1')}",
+                         "carol,Carol,"])
+    assert import_file(client, owner, "accounts.csv", content)["data"]["created"] == 3
+
+    # 默认密码逐个账号加盐,哈希值互不相同
+    auth_values = db.scalars(select(UserAuth.auth_value).join(User, User.id == UserAuth.user_id)
+                             .where(User.account.in_(["alice", "carol"]))).all()
+    assert len(set(auth_values)) == 2
+
+    # 已导入的数据在唯一性判断时即被拒绝,不计算密码哈希
+    hashed = []
+    monkeypatch.setattr(hash_api, "hash", lambda plain_text: hashed.append(plain_text))
+    data = import_file(client, owner, "accounts.csv", content)["data"]
+
+    assert (data["created"], hashed) == (0, [])
+    assert {error["code"] for error in data["errors"]} == {APIErr.ACCOUNT_EXISTSED["code"]}
+
+
+def test_import_batch_failure(client, db, owner, monkeypatch):
+    monkeypatch.setattr(settings, "import_batch_size", 2)
+    check = UserAPI.check_import_accounts
+
+    def check_then_race(session, users):
+        failures = check(session, users)
+        # 模拟唯一性判断之后其他请求并发写入了同名账号,该批次插入违反唯一约束
+        if any(user["account"] == "carol" for user in users):
+            with Session(engine) as other:
+                other.add(User(user_uuid="usr_race", account="carol", nickname="Race"))
+                other.commit()
+        return failures
+
+    monkeypatch.setattr(UserAPI, "check_import_accounts", staticmethod(check_then_race))
+    content = "\n".join(["account,nickname", "alice,Alice", "member,Dup", "carol,Carol", "dave,Dave", "erin,Erin"])
+    data = import_file(client, owner, "accounts.csv", content)["data"]
+
+    # 失败的批次记录到该批次的行,之前和之后的批次正常导入
+    assert (data["total"], data["created"]) == (5, 2)
+    assert [(error["line"], error["code"]) for error in data["errors"]] == [
+        (3, APIErr.ACCOUNT_EXISTSED["code"]),
+        (4, APIErr.IMPORT_BATCH_FAILED["code"]),
+        (5, APIErr.IMPORT_BATCH_FAILED["code"]),
+    ]
+    assert set(db.scalars(select(User.account).where(User.account.in_(["alice", "dave", "erin"])))) == {"alice", "erin"}
+
+
+def test_import_read_failure(client, owner):
+    # 第2行跨越读取缓冲区,之后的非UTF-8内容在读取第2行时解码失败
+    content = b"\n".join([
+        json.dumps(dict(account="alice", nickname="Alice")).encode(),
+        json.dumps(dict(account="bob", nickname="Bob", remark="x" * 10000)).encode(),
+        b"\xff\xfe",
+    ])
+    rsp = client.post("/account/import", headers=owner,
+                      files=dict(file=("accounts.jsonl", content, "application/octet-stream")))
+    data = rsp.json()["data"]
+
+    assert (data["total"], data["created"]) == (1, 1)
+    assert [(error["line"], error["code"]) for error in data["errors"]] == [(2, APIErr.IMPORT_READ_ERROR["code"])]
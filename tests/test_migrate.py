@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import text, insert, update
+import model_script
+from api.deps import engine
+from api.model.org import Org
+from api.model.user import User
+
+
+def drop_index(db, name: str):
+    db.execute(text(f"DROP INDEX {name}"))
+
+
+def test_duplicate_org_name_aborts(db, capsys):
+    drop_index(db, "uni_org_name")
+    db.execute(insert(Org), [dict(org_uuid="org_2", org_name="Org1")])
+    db.commit()
+
+    with pytest.raises(SystemExit):
+        model_script.init_index(engine)
+    assert "uni_org_name" in capsys.readouterr().out
+
+
+def test_duplicate_phone_aborts(db, capsys):
+    drop_index(db, "uni_user_phone_bidx")
+    db.execute(update(User).values(phone_bidx="same"))
+    db.commit()
+
+    with pytest.raises(SystemExit):
+        model_script.init_index(engine)
+    assert "uni_user_phone_bidx" in capsys.readouterr().out
+
+
+def test_deleted_and_empty_duplicates_allowed(db):
+    drop_index(db, "uni_org_name")
+    drop_index(db, "uni_user_phone_bidx")
+    # 已删除的组织及未填写手机号的账号不受唯一索引限制
+    db.execute(insert(Org), [dict(org_uuid="org_2", org_name="Org1", is_deleted=True)])
+    db.execute(update(User).values(phone_bidx=""))
+    db.commit()
+
+    model_script.init_index(engine)
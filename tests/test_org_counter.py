@@ -0,0 +1,93 @@
+from sqlalchemy import select, update
+from api.model.org import Org, OrgUser, OptOrgUserStatus
+from api.model.role import Role
+from api.schema.member import refresh_org_member, recount_org_counters
+from api.schema.role import RoleAPI
+from tests.conftest import add_members
+
+COUNTERS = (Org.member_total, Org.member_enable, Org.member_disable, Org.role_total)
+
+
+def counters(session, org_uuid: str = "org_1") -> tuple:
+    session.rollback()
+    return tuple(session.execute(select(*COUNTERS).where(Org.org_uuid == org_uuid)).one())
+
+
+def assert_recount(session) -> None:
+    r"""增量维护的计数与重新统计的结果一致
+    """
+    session.rollback()
+    maintained = session.execute(select(Org.id, *COUNTERS).order_by(Org.id)).all()
+    recount_org_counters(session)
+    assert session.execute(select(Org.id, *COUNTERS).order_by(Org.id)).all() == maintained
+    session.rollback()
+
+
+def test_members(db):
+    assert counters(db) == (2, 2, 0, 0)
+    add_members(db, 3)
+    assert counters(db) == (5, 5, 0, 0)
+
+    # 组织用户状态变化只在启用和禁用之间转移
+    db.execute(update(OrgUser).where(OrgUser.user_id == 2).values(org_user_status=OptOrgUserStatus.DISABLE.value))
+    refresh_org_member(db, user_ids=[2])
+    db.commit()
+    assert counters(db) == (5, 4, 1, 0)
+    assert_recount(db)
+
+
+def test_updated_at_unchanged(db):
+    updated_at = db.scalar(select(Org.updated_at).where(Org.id == 1))
+    add_members(db, 2)
+    RoleAPI.create_role(db, Role(role_name="r2", app_uuid="app_1", role_org_uuid="org_1"))
+    assert db.scalar(select(Org.updated_at).where(Org.id == 1)) == updated_at
+
+
+def test_create_org(client, db, owner):
+    rsp = client.post("/org/create", headers=owner, json=dict(org_name="Org2", org_owner_uuid="usr_member"))
+    assert rsp.json()["code"] == 0
+    org_uuid = db.scalar(select(Org.org_uuid).where(Org.org_name == "Org2"))
+
+    assert counters(db, org_uuid) == (1, 1, 0, 0)
+    assert counters(db) == (2, 2, 0, 0)
+    assert_recount(db)
+
+
+def test_delete_account(client, db, owner):
+    uuids = add_members(db, 4)
+    client.post("/account/delete", headers=owner, json=dict(user_uuid=uuids[0]))
+    # 重复删除不再扣减
+    client.post("/account/delete", headers=owner, json=dict(user_uuid=uuids[0]))
+    assert counters(db) == (5, 5, 0, 0)
+
+    rsp = client.post("/account/batch_delete", headers=owner, json=dict(user_uuids=uuids[1:] + uuids))
+    assert rsp.json()["data"] == 3
+    assert counters(db) == (2, 2, 0, 0)
+    assert_recount(db)
+
+
+def test_role(db):
+    RoleAPI.create_role(db, Role(role_name="r2", app_uuid="app_1", role_org_uuid="org_1"))
+    RoleAPI.create_role(db, Role(role_name="r3", app_uuid="app_1", role_org_uuid="org_1"))
+    # 非组织专属角色不计数
+    RoleAPI.create_role(db, Role(role_name="r4", app_uuid="app_1"))
+    assert counters(db) == (2, 2, 0, 2)
+
+    role_id = db.scalar(select(Role.id).where(Role.role_name == "r2"))
+    RoleAPI.delete_role(db, role_id)
+    RoleAPI.delete_role(db, role_id)
+    assert counters(db) == (2, 2, 0, 1)
+    assert_recount(db)
+
+
+def test_org_api(client, db, owner):
+    add_members(db, 2)
+    db.execute(update(Org).where(Org.id == 1).values(role_total=Org.role_total + 1))
+    db.commit()
+    expected = dict(member_total=4, member_enable=4, member_disable=0, role_total=1)
+
+    detail = client.get("/org/detail", headers=owner, params=dict(org_uuid="org_1")).json()["data"]
+    records = client.get("/org/list", headers=owner).json()["data"]["records"]
+
+    assert {key: detail[key] for key in expected} == expected
+    assert {key: records[0][key] for key in expected} == expected
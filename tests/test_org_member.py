@@ -0,0 +1,100 @@
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+from api.model.user import User, UserAuth
+from api.model.org import OrgMember
+from api.schema.member import org_member_source, refresh_org_member
+from tests.conftest import add_members
+
+FIELDS = ("org_uuid", "org_name", "user_uuid", "account", "nickname", "account_status", "org_user_status")
+
+
+def members(session) -> set[tuple]:
+    r"""读模型中的组织成员
+    """
+    session.rollback()
+    return set(session.execute(select(*[OrgMember.__table__.c[field] for field in FIELDS])).all())
+
+
+def source_members(session) -> set[tuple]:
+    r"""由组织用户关联组织和账号得到的组织成员
+    """
+    session.rollback()
+    subquery = org_member_source()[1].subquery()
+    return set(session.execute(select(*[subquery.c[field] for field in FIELDS])).all())
+
+
+def test_seed(db):
+    assert members(db) == source_members(db)
+    assert len(members(db)) == 2
+
+
+def test_create_org(client, db, owner):
+    rsp = client.post("/org/create", headers=owner, json=dict(org_name="Org2", org_owner_uuid="usr_member"))
+    assert rsp.json()["code"] == 0
+
+    assert members(db) == source_members(db)
+    assert {(org_name, user_uuid) for _, org_name, user_uuid, *_ in members(db)} >= {("Org2", "usr_member")}
+
+
+def test_update_account(client, db, owner):
+    rsp = client.post("/account/update", headers=owner,
+                      json=dict(user_uuid="usr_member", nickname="Renamed", account_status=0))
+    assert rsp.json()["code"] == 0
+
+    assert members(db) == source_members(db)
+    assert db.scalar(select(OrgMember.nickname).where(OrgMember.user_uuid == "usr_member")) == "Renamed"
+
+
+def test_delete_account(client, db, owner):
+    add_members(db, 2)
+    db.add_all([UserAuth(user_id=user_id) for user_id in db.scalars(select(User.id).where(User.account.like("usr_m%")))])
+    db.commit()
+    rsp = client.post("/account/delete", headers=owner, json=dict(user_uuid="usr_m0"))
+    assert rsp.json()["code"] == 0
+
+    assert members(db) == source_members(db)
+    assert "usr_m0" not in {user_uuid for _, _, user_uuid, *_ in members(db)}
+    # 认证信息按用户ID删除,不影响其他账号
+    user_id = db.scalar(select(User.id).where(User.user_uuid == "usr_m0"))
+    assert db.scalar(select(UserAuth.is_deleted).where(UserAuth.user_id == user_id)) is True
+    assert db.scalars(select(UserAuth.is_deleted).where(UserAuth.user_id != user_id)).all() == [False] * 3
+
+
+def test_user_list(client, db, owner):
+    add_members(db, 3)
+    rsp = client.get("/org/user_list", headers=owner, params=dict(org_uuid="org_1", page_size=100))
+    records = rsp.json()["data"]["records"]
+
+    assert sorted(record["account"] for record in records) == sorted(
+        account for _, _, _, account, *_ in source_members(db))
+
+
+def test_rebuild(db):
+    add_members(db, 5)
+    expected = source_members(db)
+
+    # 全量重建与增量刷新结果一致
+    refresh_org_member(db)
+    db.commit()
+    assert members(db) == expected
+
+    # 指定的刷新范围为空时不处理
+    refresh_org_member(db, org_ids=[], user_ids=[])
+    db.commit()
+    assert members(db) == expected
+
+
+def test_refresh_locks_orgs(db):
+    # 刷新前按ID顺序锁定涉及的组织行,并发刷新同一组织成员时串行执行(SQLite不生成FOR UPDATE,按PostgreSQL编译检查)
+    statements = []
+    listener = lambda state: statements.append(state.statement)
+    event.listen(db, "do_orm_execute", listener)
+    try:
+        refresh_org_member(db, user_ids=[2])
+        db.commit()
+    finally:
+        event.remove(db, "do_orm_execute", listener)
+
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert sql.startswith("SELECT t_org.id") and sql.endswith("ORDER BY t_org.id FOR UPDATE")
+    assert members(db) == source_members(db)
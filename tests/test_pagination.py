@@ -0,0 +1,52 @@
+import pytest
+from tests.conftest import add_members
+
+
+def walk(client, path: str, headers: dict, page_size: int, **params) -> list[dict]:
+    r"""按next_cursor翻页至最后一页,返回所有数据
+    """
+    records, cursor = [], ""
+    for _ in range(100):
+        rsp = client.get(path, headers=headers, params=dict(params, cursor=cursor, page_size=page_size))
+        assert rsp.status_code == 200, rsp.text
+        data = rsp.json()["data"]
+        assert len(data["records"]) <= page_size
+        records += data["records"]
+        if not (cursor := data["pagination"]["next_cursor"]):
+            return records
+    pytest.fail("翻页未结束")
+
+
+@pytest.mark.parametrize("page_size", [1, 7, 10, 100])
+def test_account_cursor_walk(client, db, owner, page_size):
+    # 同一秒内写入的数据,翻页只能依赖(created_at, id)的组合排序
+    add_members(db, 25)
+
+    records = walk(client, "/account/list", owner, page_size)
+    uuids = [record["user_uuid"] for record in records]
+
+    assert len(uuids) == len(set(uuids)) == 27
+
+
+def test_org_user_cursor_walk(client, db, owner):
+    add_members(db, 23)
+
+    records = walk(client, "/org/user_list", owner, 5, org_uuid="org_1")
+    accounts = [record["account"] for record in records]
+
+    assert len(accounts) == len(set(accounts)) == 25
+
+
+def test_cursor_matches_offset_order(client, db, owner):
+    add_members(db, 12)
+
+    rsp = client.get("/account/list", headers=owner, params=dict(page_size=100))
+    offset_uuids = [record["user_uuid"] for record in rsp.json()["data"]["records"]]
+    cursor_uuids = [record["user_uuid"] for record in walk(client, "/account/list", owner, 5)]
+
+    assert cursor_uuids == offset_uuids
+
+
+def test_invalid_cursor(client, owner):
+    rsp = client.get("/account/list", headers=owner, params=dict(cursor="not-a-cursor"))
+    assert rsp.status_code == 400
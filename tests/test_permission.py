@@ -0,0 +1,71 @@
+from sqlalchemy import update
+from api.config import settings
+from api.deps import scope_registry
+from api.model.role import OrgUserRole, OptRoleStatus
+from api.schema.permission import PermissionAPI
+from api.schema.role import RoleAPI
+from api.security import jwt_api
+from tests.conftest import login
+
+
+def revoke_member_role(db):
+    db.execute(update(OrgUserRole).where(OrgUserRole.user_uuid == "usr_member").values(is_deleted=True))
+    db.commit()
+
+
+def test_scopes_resolved_from_roles(client, member, owner):
+    assert client.get("/account/list", headers=member).status_code == 200
+    assert client.get("/org/list", headers=member).status_code == 403
+    # 组织Owner无需鉴权
+    assert client.get("/org/list", headers=owner).status_code == 200
+
+
+def test_scope_cache_invalidation(client, db, member):
+    assert client.get("/account/list", headers=member).status_code == 200
+    revoke_member_role(db)
+
+    # 缓存有效期内沿用已解析的授权范围,失效后重新查询
+    assert client.get("/account/list", headers=member).status_code == 200
+    PermissionAPI.invalidate_actor_scopes("org_1", "usr_member")
+    assert client.get("/account/list", headers=member).status_code == 403
+
+
+def test_disabled_role_invalidates_cache(client, db, member):
+    assert client.get("/account/list", headers=member).status_code == 200
+
+    RoleAPI.update_role(db, 1, "r1", "", OptRoleStatus.DISABLE)
+
+    assert client.get("/account/list", headers=member).status_code == 403
+
+
+def test_token_scope_bitmap(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "jwt_scope_bitmap", True)
+    headers = login(client, "member")
+    payload = jwt_api.decode(headers["Authorization"].split()[1])
+
+    assert payload["scope_version"] == scope_registry.version
+    assert scope_registry.decode(payload["scope_bitmap"]) == scope_registry.mask(["account:list"])
+
+    # 位图校验不查询授权范围,角色变更在token过期前不生效
+    revoke_member_role(db)
+    PermissionAPI.invalidate_actor_scopes()
+    assert client.get("/account/list", headers=headers).status_code == 200
+    assert client.get("/org/list", headers=headers).status_code == 403
+
+    # 权限标识变更(版本不一致)时位图失效,按授权范围校验
+    monkeypatch.setattr(scope_registry, "version", scope_registry.version + 1)
+    assert client.get("/account/list", headers=headers).status_code == 403
+
+
+def test_owner_token_without_bitmap(client, monkeypatch):
+    monkeypatch.setattr(settings, "jwt_scope_bitmap", True)
+    payload = jwt_api.decode(login(client, "owner")["Authorization"].split()[1])
+
+    assert payload["is_org_owner"] is True
+    assert not payload.get("scope_bitmap")
+
+
+def test_registry_roundtrip():
+    scopes = scope_registry.scopes[::3]
+    assert scope_registry.decode(scope_registry.encode(scopes)) == scope_registry.mask(scopes)
+    assert scope_registry.mask(["unknown:scope"]) == 0
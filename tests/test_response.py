@@ -0,0 +1,42 @@
+import pytest
+from api.config import settings
+from api.deps import FastJSONResponse
+from api.main import app
+
+ORG_FIELDS = ["org_uuid", "org_name", "org_status", "member_total", "member_enable", "member_disable",
+              "role_total", "created_at", "updated_at", "nickname"]
+APP_FIELDS = ["app_name", "app_desc", "created_at", "updated_at"]
+
+
+def test_default_response_class():
+    if settings.orjson_response:
+        assert app.router.default_response_class is FastJSONResponse
+
+
+@pytest.mark.parametrize("path, fields", [
+    ("/org/list", ORG_FIELDS[:2] + ["org_owner_uuid"] + ORG_FIELDS[2:]),
+    ("/app/list", ["id", "app_uuid"] + APP_FIELDS),
+])
+def test_list_shape(client, owner, path, fields):
+    # 列表记录的键顺序与查询字段顺序一致
+    rsp = client.get(path, headers=owner)
+    assert rsp.status_code == 200, rsp.text
+    data = rsp.json()["data"]
+    assert list(data) == ["records", "pagination"]
+    assert [list(record) for record in data["records"]] == [fields]
+
+
+@pytest.mark.parametrize("path, params, fields", [
+    ("/org/detail", dict(org_uuid="org_1"), ORG_FIELDS),
+    ("/app/detail", dict(app_uuid="app_1"), APP_FIELDS),
+])
+def test_detail_shape(client, owner, path, params, fields):
+    rsp = client.get(path, headers=owner, params=params)
+    assert rsp.status_code == 200, rsp.text
+    assert list(rsp.json()) == ["code", "message", "data"]
+    assert list(rsp.json()["data"]) == fields
+
+    # 不存在时data为null
+    rsp = client.get(path, headers=owner, params={key: "missing" for key in params})
+    assert rsp.status_code == 200, rsp.text
+    assert rsp.json()["data"] is None
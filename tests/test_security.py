@@ -0,0 +1,69 @@
+import asyncio
+import random
+from threading import Event
+import pytest
+from api.security import HashPool, HashPoolBusy, PhoneCipher, hash_api, client_aes_api, server_aes_api
+import api.service.account
+import api.service.auth
+
+
+@pytest.fixture
+def busy_pool(monkeypatch):
+    r"""1个工作线程及1个排队位置均被阻塞任务占满的哈希执行器
+    """
+    pool = HashPool(workers=1, queue_size=1)
+    release = Event()
+    futures = [pool.submit(release.wait) for _ in range(2)]
+    monkeypatch.setattr(api.service.auth, "hash_pool", pool)
+    monkeypatch.setattr(api.service.account, "hash_pool", pool)
+
+    yield pool
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    pool.shutdown()
+
+
+def test_hash_pool_bounded(busy_pool):
+    with pytest.raises(HashPoolBusy):
+        busy_pool.submit(hash_api.hash, "qwe321")
+
+
+def test_hash_pool_releases_slots():
+    pool = HashPool(workers=1, queue_size=1)
+    try:
+        # 任务完成后释放排队位置,超过上限的任务数可依次完成
+        for _ in range(4):
+            assert asyncio.run(pool.verify("qwe321", pool.submit(hash_api.hash, "qwe321").result(timeout=5)))
+        assert len(asyncio.run(pool.hash_many(["a", "b", "c"]))) == 3
+    finally:
+        pool.shutdown()
+
+
+def test_login_busy(client, busy_pool):
+    rsp = client.post("/auth/login", json=dict(account="owner", password_enc=client_aes_api.encrypt("qwe321")))
+    assert rsp.status_code == 503
+
+
+def test_import_busy(client, owner, busy_pool):
+    rsp = client.post("/account/import", headers=owner,
+                      files=dict(file=("a.csv", b"account,nickname\nalice,Alice\n")))
+    assert rsp.status_code == 503
+
+
+@pytest.mark.parametrize("mask", [True, False])
+def test_phone_cipher_matches_aes(mask):
+    # 批量解密(含重复号码,共用密文段及空值)与逐个调用AESAPI.phone_decrypt结果一致
+    rng = random.Random(1)
+    phones = [f"1{rng.randrange(10 ** 10):010d}" for _ in range(50)]
+    phones += phones[:5] + ["18012345678", "18012345679", ""]
+    encrypted = [server_aes_api.phone_encrypt(phone) for phone in phones]
+    expected = [server_aes_api.phone_decrypt(text, mask) for text in encrypted]
+
+    cipher = PhoneCipher(server_aes_api, cache_size=64)
+    assert cipher.decrypt_many(encrypted, mask) == expected
+    # 第二次解密命中缓存,结果不变
+    assert cipher.decrypt_many(encrypted, mask) == expected
+    assert [cipher.decrypt(text, mask) for text in encrypted] == expected
+    assert cipher.decrypt_many([], mask) == []
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import select, func
+import api.schema.base
+import api.schema.org
+import api.schema.user
+from api.errcode import APIErr
+from api.model.org import Org
+from api.model.user import User, UserAuth
+from api.schema.org import OrgAPI
+from api.schema.user import UserAPI
+from api.security import phone_blind_index
+
+
+@pytest.fixture(params=["on_conflict", "savepoint"])
+def insert_mode(request, monkeypatch):
+    r"""分别验证ON CONFLICT插入和保存点插入(不支持ON CONFLICT的数据库)
+    """
+    if request.param == "savepoint":
+        monkeypatch.setattr(api.schema.base, "ON_CONFLICT_INSERT", {})
+    return request.param
+
+
+def create_account(db, account: str, phone: str = "") -> dict:
+    return UserAPI.create_account(db, User(account=account, nickname=account, phone_bidx=phone_blind_index(phone)),
+                                  UserAuth(auth_value="x"))
+
+
+def create_org(db, org_name: str) -> dict:
+    return OrgAPI.create_org(db, Org(org_name=org_name, org_owner_uuid="usr_owner"))
+
+
+def test_account_conflicts(db, insert_mode):
+    assert create_account(db, "alice", "13800000001") == APIErr.NO_ERROR
+    assert create_account(db, "alice", "13800000002") == APIErr.ACCOUNT_EXISTSED
+    assert create_account(db, "bob", "13800000001") == APIErr.PHONE_EXISTED
+    # 未填写手机号的账号不受手机号唯一约束限制
+    assert create_account(db, "carol") == APIErr.NO_ERROR
+    assert create_account(db, "dave") == APIErr.NO_ERROR
+
+    assert db.scalar(select(func.count()).select_from(User)) == 5
+    assert db.scalar(select(func.count()).select_from(UserAuth)) == 5
+
+
+def test_account_uuid_conflict(db, insert_mode, monkeypatch):
+    monkeypatch.setattr(api.schema.user, "create_usr_uuid", lambda: "usr_member")
+    assert create_account(db, "alice") == APIErr.USER_UUID_EXISTED
+
+
+def test_deleted_phone_released(db):
+    assert create_account(db, "alice", "13800000001") == APIErr.NO_ERROR
+    uuid = db.scalar(select(User.user_uuid).where(User.account == "alice"))
+    assert UserAPI.delete_account(db, uuid) == APIErr.NO_ERROR
+    assert create_account(db, "bob", "13800000001") == APIErr.NO_ERROR
+
+
+def test_org_conflicts(db, insert_mode):
+    assert create_org(db, "Org2") == APIErr.NO_ERROR
+    assert create_org(db, "Org2") == APIErr.ORG_NAME_EXISTED
+    assert create_org(db, "Org1") == APIErr.ORG_NAME_EXISTED
+    assert db.scalar(select(func.count()).select_from(Org)) == 2
+
+
+def test_org_uuid_conflict(db, insert_mode, monkeypatch):
+    monkeypatch.setattr(api.schema.org, "create_org_uuid", lambda: "org_1")
+    assert create_org(db, "Org2") == APIErr.ORG_UUID_EXISTED
+    assert db.scalar(select(func.count()).select_from(Org)) == 1
+
+
+def test_create_account_api(client, owner):
+    body = dict(account="alice", nickname="Alice", phone="13800000001")
+    assert client.post("/account/create", headers=owner, json=body).json()["code"] == APIErr.NO_ERROR["code"]
+    assert client.post("/account/create", headers=owner, json=body).json()["code"] == APIErr.ACCOUNT_EXISTSED["code"]
+    body.update(account="bob")
+    assert client.post("/account/create", headers=owner, json=body).json()["code"] == APIErr.PHONE_EXISTED["code"]